@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# Logger benchmark. "generate" writes synthetic log output in the wire
+# format of engine/util/logger.d, and "run" pipes it through logger's
+# Supervisor to the headless path or to the GUI, reporting sustained lines/s,
+# tick times and memory. Lines dropped by the GUI queue are not counted to
+# throughput. Examples:
+#
+#   logbench.py generate --rate 10000 --lines 100000
+#   logbench.py run --lines 1000000 --mix plain:20,channel:20,watch:60
+#   logbench.py run --gui --lines 500000 --expect-rate 100000
+#
+###############################################################################
+
+import sys, os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logger import Headless, Meter, settings
+
+from time import perf_counter
+
+###############################################################################
+#
+# Generating
+#
+###############################################################################
+
+def parsemix(text):
+    mix = {}
+    for item in text.split(","):
+        kind, weight = item.split(":")
+        if kind not in ("plain", "channel", "watch"):
+            raise ValueError("Unknown line kind: %s" % kind)
+        mix[kind] = int(weight)
+    return mix
+
+#------------------------------------------------------------------------------
+# Lines are generated in 10 ms slices, and written with single write per
+# slice. With rate 0, slices are written as fast as possible.
+#------------------------------------------------------------------------------
+
+def generate(args):
+    import random, time
+
+    rng = random.Random(args.seed)
+    mix = parsemix(args.mix)
+    kinds = rng.choices(list(mix.keys()), list(mix.values()), k = 4096)
+    words = ["render", "batch", "feeder", "frame", "shader", "texture", "node", "update"]
+    channels = ["Chan%d" % i for i in range(args.channels)]
+    tags = ["Tag%d" % i for i in range(args.tags)]
+
+    def text():
+        line = []
+        while sum(map(len, line)) < args.length:
+            line.append(rng.choice(words))
+        return " ".join(line)
+
+    payloads = [text() for i in range(256)]
+
+    def line(i):
+        kind = kinds[i % len(kinds)]
+        if kind == "plain":
+            return payloads[i % 256]
+        if kind == "channel":
+            return ":%s>%s" % (channels[i % len(channels)], payloads[i % 256])
+        return "@%s:%s>%.2f ms" % (channels[i % len(channels)], tags[i % len(tags)], 16 + rng.random())
+
+    out = sys.stdout
+    perslice = max(1, args.rate // 100) if args.rate else 1000
+    started = time.monotonic()
+    i = 0
+    while i < args.lines:
+        n = min(perslice, args.lines - i)
+        out.write("\n".join(line(i + k) for k in range(n)) + "\n")
+        out.flush()
+        i += n
+        if args.rate:
+            delay = started + i / args.rate - time.monotonic()
+            if delay > 0: time.sleep(delay)
+
+###############################################################################
+#
+# Running benchmark
+#
+###############################################################################
+
+def gencmd(args):
+    import shlex
+    return " ".join(shlex.quote(a) for a in [
+        sys.executable, os.path.abspath(__file__), "generate",
+        "--rate", str(args.rate),
+        "--lines", str(args.lines),
+        "--mix", args.mix,
+        "--channels", str(args.channels),
+        "--tags", str(args.tags),
+        "--length", str(args.length),
+        "--seed", str(args.seed),
+    ])
+
+def percentile(values, p):
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+def maxrss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+#------------------------------------------------------------------------------
+# Headless: Log lines are written to files in temporary directory
+#------------------------------------------------------------------------------
+
+def run_headless(args, cmd):
+    import tempfile, argparse
+
+    meter = Meter()
+    with tempfile.TemporaryDirectory() as outdir:
+        headless = Headless(
+            argparse.Namespace(channel = None, output = outdir, watch = os.devnull, perf = None, mute = None),
+            meter = meter,
+        )
+        started = perf_counter()
+        headless.run(cmd)
+        elapsed = perf_counter() - started
+
+    return elapsed, meter.ticks, meter.latencies, headless.dropped
+
+#------------------------------------------------------------------------------
+# GUI: MainWindow runs the generator, and window is closed when it is done
+# and the queue is drained.
+#------------------------------------------------------------------------------
+
+def run_gui(args, cmd):
+    from loggui import MainWindow, Tk
+
+    ticks, latencies = [], []
+
+    class Window(MainWindow):
+
+        def diagnostics(self, started, readtimes):
+            now = perf_counter()
+            ticks.append(now - started)
+            latencies.extend(now - t for t in readtimes)
+            super(Window, self).diagnostics(started, readtimes)
+            if not self.supervisor.running() and not self.queue.qsize(): self.master.quit()
+
+    root = Tk()
+    root.geometry(settings["MainWindow"]["geometry"])
+    main = Window(root, cmd)
+
+    started = perf_counter()
+    main.start(cmd)
+    root.mainloop()
+    elapsed = perf_counter() - started
+    dropped = main.supervisor.sink.dropped
+    root.destroy()
+
+    return elapsed, ticks, latencies, dropped
+
+#------------------------------------------------------------------------------
+
+def run(args):
+    import json
+
+    if args.overflow is not None: settings["Ingest"]["overflow"] = args.overflow
+
+    cmd = gencmd(args)
+    if args.gui:
+        elapsed, ticks, latencies, dropped = run_gui(args, cmd)
+    else:
+        elapsed, ticks, latencies, dropped = run_headless(args, cmd)
+
+    result = {
+        "mode": "gui" if args.gui else "headless",
+        "lines": args.lines,
+        "dropped": dropped,
+        "seconds": round(elapsed, 3),
+        "lines_per_s": round((args.lines - dropped) / elapsed),
+        "tick_p50_ms": round(1000 * percentile(ticks, 0.50), 2),
+        "tick_p99_ms": round(1000 * percentile(ticks, 0.99), 2),
+        "latency_p99_ms": round(1000 * percentile(latencies, 0.99), 2),
+        "maxrss_bytes": maxrss(),
+    }
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key, value in result.items(): print("%-16s %s" % (key, value))
+
+    failed = False
+    if args.expect_rate and result["lines_per_s"] < args.expect_rate:
+        print("FAIL: lines/s %d < %d" % (result["lines_per_s"], args.expect_rate), file = sys.stderr)
+        failed = True
+    if args.expect_p99 and result["tick_p99_ms"] > args.expect_p99:
+        print("FAIL: tick p99 %.2f ms > %.2f ms" % (result["tick_p99_ms"], args.expect_p99), file = sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+###############################################################################
+#
+# Parse arguments
+#
+###############################################################################
+
+def parseargs():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest = "command")
+    sub.required = True
+
+    def generator(p):
+        p.add_argument("--rate", type=int, default = 0, help = "Lines per second (0 = unlimited)")
+        p.add_argument("--lines", type=int, default = 100000, help = "Number of lines")
+        p.add_argument("--mix", type=str, default = "plain:60,channel:30,watch:10", help = "Line kind weights")
+        p.add_argument("--channels", type=int, default = 8, help = "Number of channels")
+        p.add_argument("--tags", type=int, default = 32, help = "Number of watch tags per channel")
+        p.add_argument("--length", type=int, default = 60, help = "Approx. length of log text")
+        p.add_argument("--seed", type=int, default = 1, help = "Random seed")
+
+    generator(sub.add_parser("generate", help = "Write synthetic log to stdout"))
+
+    p = sub.add_parser("run", help = "Run benchmark")
+    generator(p)
+    p.add_argument("--gui", action="store_true", help = "Benchmark GUI instead of headless path")
+    p.add_argument("--overflow", type=str, choices = ("drop", "block"), default = None, help = "GUI queue overflow policy")
+    p.add_argument("--json", action="store_true", help = "Print result as JSON")
+    p.add_argument("--expect-rate", type=int, default = 0, help = "Fail if lines/s is below this")
+    p.add_argument("--expect-p99", type=float, default = 0, help = "Fail if p99 tick time (ms) is above this")
+
+    return parser.parse_args()
+
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    args = parseargs()
+    if args.command == "generate":
+        try:
+            generate(args)
+        except BrokenPipeError:
+            pass
+    else:
+        sys.exit(run(args))
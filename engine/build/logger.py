@@ -10,7 +10,7 @@
 # Check Python version
 #------------------------------------------------------------------------------
 
-import sys
+import sys, os
 
 if sys.version_info.major < 3:
     print("Python version:",  ".".join(map(str, sys.version_info[:3])))
@@ -28,29 +28,6 @@ import platform
 platform.windows = (platform.system() == "Windows")
 platform.linux   = (platform.system() == "linux")
 
-###############################################################################
-#
-# Parse arguments
-#
-###############################################################################
-
-def parseargs():
-    import argparse
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-C",   type=str, metavar="<dir>", dest="cwd", default = None, help = "Specify working directory")
-    parser.add_argument("exe", type=str, nargs="?", default = "scons run", help = "Specify binary file")
-
-    return parser.parse_args()
-
-args = parseargs()
-
-#------------------------------------------------------------------------------
-
-if args.cwd != None:
-    import os
-    os.chdir(args.cwd)
-
 ###############################################################################
 #
 # Settings, and default settings. To be done... Remember to save options
@@ -68,38 +45,72 @@ settings = migrate(
         "MainWindow": {
             "geometry": "900x600",
         },
+        "Ingest": {
+            "interval": 50,         # ms between UI ticks
+            "budget": 0.025,        # seconds of record processing per tick
+            "queuesize": 1000,      # max. pending line batches from worker
+            "overflow": "drop",     # "drop" or "block" when queue is full
+        },
+        "LogView": {
+            "memory": 64 << 20,     # bytes of log lines kept in memory, shared by all log tabs
+        },
+        "History": {
+            "size": 256,            # points per level in watch history
+            "factor": 8,            # points combined to one on next level
+            "levels": 4,
+            "sparkline": 24,        # sparkline width (characters)
+        },
+        "Socket": {
+            "listen": True,         # accept game connections
+            "path": None,           # None: default path
+        },
+        "Perf": {
+            "channels": ["Perf", "Frametime"],  # watch channels with frame times
+            "bits": 7,              # histogram sub-buckets per power of two (2^bits)
+        },
+        "Search": {
+            "index": True,          # maintain search index for log lines
+            "results": 500,         # max. lines in search result list
+        },
     }
 )
 
 ###############################################################################
 #
-# Run build & game with threads, so that you can read stdout & stderr
+# Run build & game. Supervisor runs any number of commands at once, and
+# reads their output and game socket connections in a single thread with
+# a selector. Records go to a shared queue in batches, tagged with the
+# session they came from.
 #
 ###############################################################################
 
 from threading import Thread
-from queue import Queue
+from queue import Queue, Empty, Full
 
 #------------------------------------------------------------------------------
-# Running subprocesses
+# Running subprocesses. Game reads logger commands from stdin, when
+# ENGINE_LOGGER is set in environment (see engine/util/logger.d). Extra
+# environment variables can be given in env.
 #------------------------------------------------------------------------------
 
-def cmd2pipe(cmd):
-    from subprocess import Popen, PIPE, DEVNULL, STDOUT
-    
+def cmd2pipe(cmd, env = {}):
+    from subprocess import Popen, PIPE, STDOUT
+
+    env = dict(os.environ, ENGINE_LOGGER = "1", **env)
+
     if(platform.windows):
         return Popen(
             cmd,
             shell = True,
             stdout = PIPE,
             stderr = STDOUT,
-            stdin = DEVNULL,
+            stdin = PIPE,
             bufsize = 0,
             close_fds = True,
-            universal_newlines = True,
+            env = env,
         )
     else:
-        import pty, os
+        import pty
         master, slave = pty.openpty()
 
         p = Popen(
@@ -107,245 +118,1472 @@ def cmd2pipe(cmd):
             shell = True,
             stdout = slave,
             stderr = STDOUT,
-            stdin = DEVNULL,
-            bufsize = 1,
+            stdin = PIPE,
             close_fds = True,
-            universal_newlines = True,
             preexec_fn=os.setsid,
+            env = env,
         )
 
         os.close(slave)
-        p.stdout = os.fdopen(master)
+        p.stdout = os.fdopen(master, "rb", buffering = 0)
         return p
 
 #------------------------------------------------------------------------------
-# Compile & run
+# Log line parsing. Wire format (see engine/util/logger.d):
+#
+#   text                    Log line
+#   :channel>text           Log line to channel
+#   @channel:tag>value      Watch update
+#   @tag>value              Watch update without channel
+#
+# Lines are parsed to records (kind, channel, tag, payload), where kind is
+# "log", "watch", "logger" (logger's own messages) or "eof". Most lines are
+# plain stdout, so those are checked first.
 #------------------------------------------------------------------------------
 
-class Worker(Thread):
+def parse(line):
+    if line[:1] not in ("@", ":"):
+        return ("log", None, None, line.strip())
 
-    def __init__(self, cmd, queue):
-        super(Worker, self).__init__(target = self.run)
+    head, sep, payload = line[1:].partition(">")
+    if not sep:
+        return ("log", None, None, line.strip())
+
+    if line[0] == ":":
+        return ("log", head, None, payload.strip())
+
+    channel, sep, tag = head.partition(":")
+    if not sep:
+        return ("watch", None, channel, payload.strip())
+    return ("watch", channel, tag, payload.strip())
+
+#------------------------------------------------------------------------------
+# Output is read in large chunks. Only complete lines are decoded and
+# parsed, the incomplete tail is kept for the next chunk. Tail is flushed
+# when it grows too long, when the process goes quiet (e.g. prompts), and
+# at end of file.
+#------------------------------------------------------------------------------
+
+class Splitter:
+
+    maxtail = 256 << 10
+
+    def __init__(self):
+        self.tail = b""
+
+    def feed(self, data):
+        data = self.tail + data
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            self.tail = data
+            return [] if len(data) < self.maxtail else self.flush()
+        self.tail = data[cut + 1:]
+        records = self.split(data[:cut])
+        if len(self.tail) >= self.maxtail: records += self.flush()
+        return records
+
+    def flush(self):
+        tail, self.tail = self.tail, b""
+        return self.split(tail) if tail else []
+
+    @staticmethod
+    def split(data):
+        return [parse(line) for line in data.decode("utf-8", "replace").split("\n")]
+
+#------------------------------------------------------------------------------
+# Batch of records read at once. Read time is used to measure latency from
+# reading to rendering, source is the id of the session it came from, and
+# held tells if the batch holds a slot of the queue limit (see Sink).
+#------------------------------------------------------------------------------
+
+class Batch(list):
+    __slots__ = ("time", "source", "held")
+
+def control(source, kind, payload = None):
+    batch = Batch([(kind, None, None, payload)])
+    batch.time = perf_counter()
+    batch.source = source
+    batch.held = False
+    return batch
+
+#------------------------------------------------------------------------------
+# Logger diagnostics: Supervisor counts lines and bytes per channel, GUI
+# adds tick times and latencies, and report() gives values for the
+# diagnostics watch channel, resetting the counters.
+#------------------------------------------------------------------------------
+
+from time import perf_counter
+
+class Meter:
+
+    def __init__(self):
+        self.channels = {}
+        self.ticks = []
+        self.latencies = []
+        self.started = perf_counter()
+
+    def count(self, batch):
+        channels = self.channels
+        for kind, channel, tag, payload in batch:
+            if kind == "watch":
+                key = "@" + (channel or "")
+            else:
+                key = channel or "-"
+            try:
+                c = channels[key]
+                c[0] += 1
+                c[1] += len(payload) + 1
+            except KeyError:
+                channels[key] = [1, len(payload) + 1]
+
+    def tick(self, seconds):
+        self.ticks.append(seconds)
+
+    def latency(self, seconds):
+        self.latencies.append(seconds)
+
+    def report(self, queued):
+        now = perf_counter()
+        elapsed = max(1e-6, now - self.started)
+        channels, self.channels = self.channels, {}
+        ticks, self.ticks = self.ticks, []
+        latencies, self.latencies = self.latencies, []
+        self.started = now
+
+        lines = sum(c[0] for c in channels.values())
+        nbytes = sum(c[1] for c in channels.values())
+
+        result = [
+            ("Lines/s", "%.0f" % (lines / elapsed)),
+            ("Bytes/s", "%.0f" % (nbytes / elapsed)),
+            ("Queue", "%d" % queued),
+            ("Tick", "%.1f ms" % (1000 * max(ticks, default = 0))),
+            ("Latency", "%.1f ms" % (1000 * max(latencies, default = 0))),
+        ]
+        for key, (n, b) in sorted(channels.items()):
+            result.append(("Lines/s [%s]" % key, "%.0f" % (n / elapsed)))
+            result.append(("Bytes/s [%s]" % key, "%.0f" % (b / elapsed)))
+        return result
+
+#------------------------------------------------------------------------------
+# Records are put to queue in batches. Number of queued batches is limited
+# (queue itself is unbounded, the limit is counted here with semaphore):
+# when the GUI can't keep up, either block the reader (which in turn blocks
+# the game when pty buffer is full), or drop the batch and count the lines.
+# Batches are recorded before queueing, so recording has everything even
+# if the GUI drops lines. Consumers take batches with get(), which frees
+# the slot.
+#
+# Control batches (logger messages, eof) don't take slots, so they are
+# never dropped, and they never block: they may come from the thread
+# consuming the queue (e.g. stop()), or from the supervisor while the
+# consumer is waiting for it to close. Blocked put gives up when sink is
+# closed.
+#------------------------------------------------------------------------------
+
+from threading import Semaphore
+
+class Sink:
+
+    def __init__(self, queue, recorder = None, meter = None):
         self.queue = queue
+        self.recorder = recorder
+        self.meter = meter
+        self.slots = Semaphore(settings["Ingest"]["queuesize"])
+        self.block = settings["Ingest"]["overflow"] == "block"
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, batch):
+        if self.recorder is not None: self.recorder.write(batch)
+        if self.acquire():
+            batch.held = True
+            self.queue.put(batch)
+        else:
+            self.dropped += len(batch)
+
+    def acquire(self):
+        if self.slots.acquire(False): return True
+        while self.block and not self.closed:
+            if self.slots.acquire(timeout = 0.1): return True
+        return False
+
+    def control(self, batch):
+        if self.recorder is not None: self.recorder.write(batch)
+        self.queue.put(batch)
+
+    def get(self, block = True):
+        batch = self.queue.get(block)
+        if batch.held: self.slots.release()
+        return batch
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def batch(self, records, source):
+        records = Batch(records)
+        records.time = perf_counter()
+        records.source = source
+        records.held = False
+        if self.meter is not None: self.meter.count(records)
+        return records
+
+#------------------------------------------------------------------------------
+# Process session. Restarting a running process kills it first, and it is
+# started again when its output has ended.
+#------------------------------------------------------------------------------
+
+class Process:
+
+    maxinput = 64 << 10
+
+    def __init__(self, sid, cmd):
+        self.id = sid
+        self.name = cmd
         self.cmd = cmd
+        self.p = None
+        self.splitter = Splitter()
+        self.input = bytearray()
+        self.feeder = None
+        self.idle = 0
+        self.running = False
+        self.restart = False
+        self.err = None
 
-    def spawn(self):
-        self.queue.put(("logger", "Executing: " + self.cmd + "\n"))
-        self.p = cmd2pipe(self.cmd)
-        return self.p.stdout
-        
-    def run(self):
-        pipe = self.spawn()
+    #--------------------------------------------------------------------------
+    # Send command to game, e.g. "mute log GC" or "unmute watch Perf".
+    # Writing never blocks the supervisor (the command may not read its
+    # stdin at all, e.g. scons): on POSIX stdin is non-blocking, and what
+    # doesn't fit to the pipe is kept (up to maxinput, later commands are
+    # dropped) and written by feed() later. On Windows, Feeder thread
+    # writes the commands.
+    #--------------------------------------------------------------------------
+
+    def start(self, p):
+        self.p = p
+        self.splitter = Splitter()
+        self.input = bytearray()
+        if platform.windows:
+            self.feeder = Feeder(p.stdin)
+            self.feeder.start()
+        else:
+            os.set_blocking(p.stdin.fileno(), False)
+
+    def send(self, command):
+        if self.p is None or self.p.stdin.closed: return
+        data = (command + "\n").encode("utf-8")
+        if self.feeder is not None:
+            self.feeder.put(data)
+        elif len(self.input) + len(data) <= self.maxinput:
+            self.input += data
+            self.feed()
+
+    def feed(self):
+        if not self.input or self.p.stdin.closed: return
         try:
-            for msg in pipe:
-                self.queue.put(("stdout", msg))
+            del self.input[:os.write(self.p.stdin.fileno(), self.input)]
+        except BlockingIOError:
+            pass
         except OSError:
-            pass  
+            self.input.clear()
 
-        pipe.close()
-        self.queue.put((None, None))
-        self.err = self.p.wait()
+    def kill(self):
+        import signal
+        if self.p is None or self.p.poll() is not None: return
+        if platform.windows:
+            self.p.terminate()
+        else:
+            try:
+                os.killpg(os.getpgid(self.p.pid), signal.SIGTERM)
+            except OSError:
+                pass
 
-    def stop(self):
-        import os, signal
-        self.queue.put(("logger", "Killing\n"))
-        os.killpg(os.getpgid(self.p.pid), signal.SIGTERM)
-        #self.pipe.close()
+#------------------------------------------------------------------------------
+# Windows can't select pipes, so there process output is read with a
+# thread per process. Worker owns the splitter of its process: tail is
+# flushed only at end of output, not by the supervisor's idle flush.
+#------------------------------------------------------------------------------
+
+class Worker(Thread):
+
+    def __init__(self, supervisor, process):
+        super(Worker, self).__init__(target = self.run)
+        self.daemon = True
+        self.supervisor = supervisor
+        self.process = process
+
+    def run(self):
+        sink, process = self.supervisor.sink, self.process
+        pipe = process.p.stdout
+        while True:
+            chunk = pipe.read(Supervisor.chunksize)
+            records = process.splitter.feed(chunk) if chunk else process.splitter.flush()
+            if records: sink.put(sink.batch(records, process.id))
+            process.idle = perf_counter()
+            if not chunk: break
+        self.supervisor.call(lambda: self.supervisor.finished(process))
+
+class Feeder(Thread):
+
+    def __init__(self, pipe):
+        super(Feeder, self).__init__(target = self.run)
+        self.daemon = True
+        self.pipe = pipe
+        self.commands = Queue(256)
+
+    def put(self, data):
+        try:
+            self.commands.put_nowait(data)
+        except Full:
+            pass
+
+    def run(self):
+        while True:
+            data = self.commands.get()
+            if data is None: break
+            try:
+                self.pipe.write(data)
+                self.pipe.flush()
+            except (OSError, ValueError):
+                break
 
 ###############################################################################
 #
-# Simple GUI
+# Socket transport: Game connects to logger's Unix domain socket (given in
+# ENGINE_LOGGER_SOCKET, or default path), and sends Log/Watch records as
+# binary frames instead of writing them to stdout. This way logger can also
+# attach to games it did not start: game retries connecting periodically.
+# Frame:
+#
+#   <size:u32> <kind:u8> <len channel:u16> <len tag:u16> <channel> <tag> <payload>
+#
+# Size is the length of the rest of the frame. Strings are UTF-8, length
+# 0xFFFF means None. Kinds: 0 = log, 1 = watch, 2 = command (logger to
+# game, payload is the command line).
 #
 ###############################################################################
 
-from   tkinter import *
-import tkinter.ttk as ttk
-from tkinter.scrolledtext import ScrolledText
+import struct, socket
+
+frame = struct.Struct("<IBHH")
+framekinds = ("log", "watch", "command")
+
+def defaultsocket():
+    if not hasattr(socket, "AF_UNIX"): return None
+    return "/tmp/engine-logger-%d.sock" % os.getuid()
+
+def encodeframe(kind, channel, tag, payload):
+    c = b"" if channel is None else channel.encode("utf-8")
+    t = b"" if tag is None else tag.encode("utf-8")
+    p = payload.encode("utf-8")
+    return frame.pack(
+        frame.size - 4 + len(c) + len(t) + len(p),
+        framekinds.index(kind),
+        0xFFFF if channel is None else len(c),
+        0xFFFF if tag is None else len(t),
+    ) + c + t + p
 
 #------------------------------------------------------------------------------
-# Text box for log lines
+# Decode all complete frames from buffer, return records and number of
+# bytes used. Only log and watch frames are taken from games, others are
+# skipped. Frame longer than maxframe, or with strings not fitting to it,
+# raises ValueError (connection is then closed), so that a misbehaving
+# client can't make the buffer grow without limit.
 #------------------------------------------------------------------------------
 
-class LogView(ScrolledText):
+maxframe = 16 << 20
 
-    def __init__(self, master, **kw):
-        super(LogView, self).__init__(master)
-        self.configure(kw)
+def decodeframes(buffer):
+    records = []
+    offset, size = 0, len(buffer)
+    while offset + frame.size <= size:
+        length, kind, lc, lt = frame.unpack_from(buffer, offset)
+        end = offset + 4 + length
+        start = offset + frame.size
+        c_end = start + (0 if lc == 0xFFFF else lc)
+        t_end = c_end + (0 if lt == 0xFFFF else lt)
+        if length > maxframe or t_end > end: raise ValueError("Bad frame")
+        if end > size: break
 
-    def add(self, tab, tag, entry, color):
-        atend = self.vbar.get()[1] == 1.0
-        self.config(state = NORMAL)
+        offset = end
+        if kind > 1: continue
+        records.append((
+            framekinds[kind],
+            None if lc == 0xFFFF else bytes(buffer[start:c_end]).decode("utf-8", "replace"),
+            None if lt == 0xFFFF else bytes(buffer[c_end:t_end]).decode("utf-8", "replace"),
+            bytes(buffer[t_end:end]).decode("utf-8", "replace"),
+        ))
+    return records, offset
 
-        if tab is None:
-            self.insert(END, entry + "\n", color)
-        else:
-            self.insert(END, "%s:%s\n" % (tab, entry), color)
+#------------------------------------------------------------------------------
+# Connection from a game. Source is the session of the process that
+# started the game, or connection's own session, if the game was not
+# started by us.
+#------------------------------------------------------------------------------
 
-        self.config(state = DISABLED)
-        if atend: self.yview(END)
+class Connection:
 
-    def clear(self):
-        self.config(state = NORMAL)
-        self.delete("1.0", END)
-        self.config(state = DISABLED)
-                
-#------------------------------------------------------------------------------
-# Listbox for updated values
-#------------------------------------------------------------------------------
-
-class WatchView(ttk.Treeview):
-
-    def __init__(self, master, **kw):
-        super(WatchView, self).__init__(master)
-        self.configure(kw)
-        self.configure(columns=("Value"))
-        
-        self.heading("#0", text="Tag")
-        self.heading("#1", text="Value")
-        self.column("#0", anchor="w", stretch=YES)
-        self.column("#1", anchor="e", stretch=NO, width=100)
-        
-    def add(self, tab, tag, entry, color):
-        gid = tab
-        iid = tab + ":" + tag
-        
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.buffer = bytearray()
+        self.pid = None
+        self.name = "game"
+        self.source = None
+        self.running = True
+        self.err = None
         try:
-            self.item(iid, values=('"%s"' % entry))
-        except TclError:
-            if not self.exists(gid):
-                self.insert('', END, iid = gid, text = tab, open = True)
-
-            self.insert(
-                gid, END,
-                iid=iid,
-                text=tag,
-                values=(entry)
-            )
+            creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+            self.pid = struct.unpack("3i", creds)[0]
+            self.name = "pid %d" % self.pid
+        except (AttributeError, OSError):
+            pass
 
-    def clear(self):
-        self.delete(*self.get_children())
-
-class MainWindow(Frame):
-
-    def __init__(self, master):
-        super(MainWindow, self).__init__(master, padx = 5, pady = 5)
-
-        self.btnbar = Frame(self)
-        Button(self.btnbar, text = "Build", command = self.build).pack(side=LEFT)
-        Button(self.btnbar, text = "Run", command = self.run).pack(side=LEFT)
-        Button(self.btnbar, text = "Build & Run", command = self.buildnrun).pack(side=LEFT)
-        Button(self.btnbar, text = "Clean", command = self.clean).pack(side=LEFT)
-        Button(self.btnbar, text = "Stop", command = self.stop).pack(side=LEFT)
-        ttk.Separator(self.btnbar, orient=VERTICAL).pack(side=LEFT, fill = Y, padx = 5)
-        Button(self.btnbar, text = "Clear", command = self.clear).pack(side=LEFT)
-        self.btnbar.pack(side=TOP, anchor="w")
-
-        paned = PanedWindow(self, orient = HORIZONTAL)
-        paned.pack(fill = BOTH, expand = 1)
-        
-        self.logbox = LogView(paned, state = DISABLED, wrap=WORD)
-        paned.add(self.logbox)
-        
-        self.logbox.tag_config("stdout")
-        self.logbox.tag_config("logger", foreground="blue")
-        
-        self.watchbox = WatchView(paned)
-        paned.add(self.watchbox)
-        
-        self.pack(fill=BOTH, expand=1)
-
-        self.queue = Queue()
-        self.check()
-        self.worker = None
-
-    #--------------------------------------------------------------------------
-    # Log line parsing
-    #--------------------------------------------------------------------------
-
-    def parse(self, entry, color):
-        tab, tag = None, None
-        
-        if entry[0] == "@":
-            tag, entry = entry[1:].split(">", 1)
-            if tag.find(":") != -1:
-                tab, tag = tag.split(":", 1)
-            self.watchbox.add(tab, tag, entry.strip(), color)
+    def send(self, command):
+        try:
+            self.sock.sendall(encodeframe("command", None, None, command))
+        except OSError:
+            pass
+
+    def kill(self):
+        pass
+
+#------------------------------------------------------------------------------
+# Parent process id, for finding out who started the game.
+#------------------------------------------------------------------------------
+
+def parentpid(pid):
+    try:
+        with open("/proc/%d/stat" % pid) as f:
+            return int(f.read().rpartition(")")[2].split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+#------------------------------------------------------------------------------
+# Listening socket. If socket file exists, but nobody is listening, it is
+# a leftover and removed. If another logger is listening, we don't.
+#------------------------------------------------------------------------------
+
+def bindsocket(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        probe.close()
+        raise OSError("Another logger is listening at %s" % path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        probe.close()
+        if os.path.exists(path): os.unlink(path)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(8)
+    sock.setblocking(False)
+    return sock
+
+###############################################################################
+#
+# Supervisor: one thread with a selector handles all process outputs and
+# game connections. Other threads talk to it with call(), which queues
+# the function and wakes up the selector.
+#
+###############################################################################
+
+import selectors
+from itertools import count
+
+class Supervisor(Thread):
+
+    chunksize = 64 << 10
+    maxbatch  = 256 << 10
+    idle      = 0.25
+
+    def __init__(self, queue, recorder = None, meter = None, commands = lambda: ()):
+        super(Supervisor, self).__init__(target = self.run)
+        self.daemon = True
+        self.sink = Sink(queue, recorder, meter)
+        self.commands = commands
+        self.sessions = {}
+        self.connections = []
+        self.ids = count(1)
+        self.calls = Queue()
+        self.selector = selectors.DefaultSelector()
+        self.wakeup, self.waker = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self.selector.register(self.wakeup, selectors.EVENT_READ, self.wake)
+        self.listener = None
+        self.path = None
+        self.reaping = []
+        self.closed = False
+
+    #--------------------------------------------------------------------------
+    # Interface for other threads
+    #--------------------------------------------------------------------------
+
+    def call(self, function):
+        self.calls.put(function)
+        try:
+            self.waker.send(b"x")
+        except OSError:
+            pass
+
+    def launch(self, cmd):
+        process = Process(next(self.ids), cmd)
+        process.running = True
+        self.sessions[process.id] = process
+        self.call(lambda: self.spawn(process))
+        return process.id
+
+    def restart(self, sid, cmd = None):
+        process = self.sessions.get(sid)
+        if not isinstance(process, Process): return False
+        if cmd is not None: process.cmd = process.name = cmd
+
+        def restart():
+            if process.running:
+                process.restart = True
+                process.kill()
+            else:
+                process.running = True
+                self.spawn(process)
+
+        self.call(restart)
+        return True
+
+    def stop(self, sid):
+        session = self.sessions.get(sid)
+        if session is None or not session.running: return
+        if isinstance(session, Process) and platform.windows:
+            self.sink.control(control(sid, "logger", "Windows: Stop not yet implemented."))
+            return
+        self.sink.control(control(sid, "logger", "Killing"))
+        session.kill()
+
+    def forget(self, sid):
+        self.stop(sid)
+        self.sessions.pop(sid, None)
+
+    def send(self, sid, command):
+        def send():
+            session = self.sessions.get(sid)
+            if session is not None: session.send(command)
+            for conn in self.connections:
+                if conn.source == sid and conn is not session: conn.send(command)
+        self.call(send)
+
+    def broadcast(self, command):
+        def broadcast():
+            for session in list(self.sessions.values()): session.send(command)
+            for conn in self.connections:
+                if conn.source in self.sessions and self.sessions[conn.source] is not conn:
+                    conn.send(command)
+        self.call(broadcast)
+
+    def running(self):
+        return any(s.running for s in list(self.sessions.values()))
+
+    #--------------------------------------------------------------------------
+    # Start listening game connections, if enabled and possible.
+    #--------------------------------------------------------------------------
+
+    def listen(self):
+        path = settings["Socket"]["path"] or defaultsocket()
+        if not settings["Socket"]["listen"] or path is None: return None
+
+        try:
+            self.listener = bindsocket(path)
+        except OSError as e:
+            print("logger: Not listening:", e, file = sys.stderr)
+            return None
+
+        self.path = path
+        self.selector.register(self.listener, selectors.EVENT_READ, self.accept)
+        return path
+
+    #--------------------------------------------------------------------------
+    # Wait until games have closed their connections (e.g. after the game
+    # process has ended).
+    #--------------------------------------------------------------------------
+
+    def wait(self, timeout):
+        from time import sleep
+        deadline = perf_counter() + timeout
+        while self.connections and perf_counter() < deadline:
+            sleep(0.01)
+
+    def close(self):
+        self.sink.closed = True
+        for session in list(self.sessions.values()): session.kill()
+        self.call(self.shutdown)
+        if self.is_alive(): self.join()
+
+    #--------------------------------------------------------------------------
+    # Event loop
+    #--------------------------------------------------------------------------
+
+    def run(self):
+        while not self.closed:
+            for key, events in self.selector.select(0.01 if self.reaping else self.idle):
+                key.data(key.fileobj)
+            self.flush()
+            if self.reaping: self.reap()
+
+    def wake(self, sock):
+        try:
+            while sock.recv(4096): pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while True:
+            try:
+                self.calls.get_nowait()()
+            except Empty:
+                break
+
+    def shutdown(self):
+        self.closed = True
+        for key in list(self.selector.get_map().values()):
+            if key.fileobj is not self.wakeup and key.fileobj is not self.listener:
+                key.fileobj.close()
+        if self.listener is not None:
+            self.listener.close()
+            if os.path.exists(self.path): os.unlink(self.path)
+        self.selector.close()
+        self.wakeup.close()
+        self.waker.close()
+
+    #--------------------------------------------------------------------------
+    # Processes
+    #--------------------------------------------------------------------------
+
+    def spawn(self, process):
+        self.sink.control(control(process.id, "logger", "Executing: " + process.cmd))
+
+        # Empty path tells the game not to connect, so that it won't send
+        # its records to some other logger listening the default path.
+        env = {"ENGINE_LOGGER_SOCKET": self.path or ""}
+        process.start(cmd2pipe(process.cmd, env))
+        for command in self.commands(): process.send(command)
+
+        if platform.windows:
+            Worker(self, process).start()
         else:
-            if entry[0] == ":":
-                tab, entry = entry[1:].split(">", 1)
-            self.logbox.add(tab, tag, entry.strip(), color)
+            os.set_blocking(process.p.stdout.fileno(), False)
+            self.selector.register(process.p.stdout, selectors.EVENT_READ, lambda pipe: self.read(process))
 
     #--------------------------------------------------------------------------
-    # Periodic update
+    # Keep reading as long as there is data immediately available (up to
+    # maxbatch bytes), so that busy processes give large batches.
     #--------------------------------------------------------------------------
-    
-    def check(self):
-        while self.queue.qsize():
-            color, msg = self.queue.get(0)
-            if msg is None:
-                if self.worker is not None: self.worker.join()
-                self.logbox.add(None, None, "Done.\n", ("logger"))
-                self.worker = None
+
+    def read(self, process):
+        fd = process.p.stdout.fileno()
+        chunks, size, eof = [], 0, False
+        while size < self.maxbatch:
+            try:
+                chunk = os.read(fd, self.chunksize)
+            except BlockingIOError:
+                break
+            except OSError:
+                chunk = b""
+            if not chunk:
+                eof = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+
+        records = process.splitter.feed(b"".join(chunks)) if chunks else []
+        if eof: records += process.splitter.flush()
+        if records: self.sink.put(self.sink.batch(records, process.id))
+        process.idle = perf_counter()
+
+        if eof:
+            self.selector.unregister(process.p.stdout)
+            self.finished(process)
+
+    def flush(self):
+        if platform.windows: return
+        now = perf_counter()
+        for session in list(self.sessions.values()):
+            if isinstance(session, Process) and session.input: session.feed()
+            if isinstance(session, Process) and session.splitter.tail and now - session.idle > self.idle:
+                records = session.splitter.flush()
+                if records: self.sink.put(self.sink.batch(records, session.id))
+
+    def finished(self, process):
+        process.p.stdout.close()
+        try:
+            process.p.stdin.close()
+        except OSError:
+            pass
+        if process.feeder is not None: process.feeder.put(None)
+        self.reaping.append(process)
+        self.reap()
+
+    #--------------------------------------------------------------------------
+    # Processes that have ended their output are polled every round (with
+    # short select timeout), so that a process running on after closing its
+    # output doesn't block us.
+    # Session state is updated before eof, so that it is up to date when eof
+    # is handled.
+    #--------------------------------------------------------------------------
+
+    def reap(self):
+        for process in list(self.reaping):
+            err = process.p.poll()
+            if err is None: continue
+            self.reaping.remove(process)
+            process.err = err
+
+            restart, process.restart = process.restart, False
+            process.running = restart
+            self.sink.control(control(process.id, "eof"))
+            if restart: self.spawn(process)
+
+    #--------------------------------------------------------------------------
+    # Game connections. Game started by one of our processes goes to the
+    # session of that process, others get sessions of their own.
+    #--------------------------------------------------------------------------
+
+    def owner(self, pid):
+        pids = dict((s.p.pid, s.id) for s in list(self.sessions.values()) if isinstance(s, Process) and s.running and s.p)
+        while pid is not None and pid > 1:
+            if pid in pids: return pids[pid]
+            pid = parentpid(pid)
+        return None
+
+    def accept(self, listener):
+        try:
+            sock, addr = listener.accept()
+        except OSError:
+            return
+
+        conn = Connection(sock)
+        conn.source = self.owner(conn.pid)
+        if conn.source is None:
+            conn.source = next(self.ids)
+            self.sessions[conn.source] = conn
+
+        self.connections.append(conn)
+        self.selector.register(sock, selectors.EVENT_READ, lambda sock: self.receive(conn))
+        for command in self.commands(): conn.send(command)
+        self.sink.control(control(conn.source, "logger", "Attached: %s" % conn.name))
+
+    def receive(self, conn):
+        try:
+            data = conn.sock.recv(self.chunksize)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+
+        if data:
+            conn.buffer += data
+            try:
+                records, used = decodeframes(conn.buffer)
+            except ValueError as e:
+                self.sink.control(control(conn.source, "logger", "%s: %s" % (conn.name, e)))
+                data = b""
             else:
-                self.parse(msg, color)
-        self.master.after(100, self.check)
+                del conn.buffer[:used]
+                if records: self.sink.put(self.sink.batch(records, conn.source))
+                return
+
+        self.selector.unregister(conn.sock)
+        conn.sock.close()
+        conn.running = False
+        self.connections.remove(conn)
+        self.sink.control(control(conn.source, "logger", "Detached: %s" % conn.name))
+        if self.sessions.get(conn.source) is conn:
+            self.sink.control(control(conn.source, "eof"))
+
+###############################################################################
+#
+# Log line storage: Lines are kept in memory until the memory ceiling is
+# reached. After that, the oldest lines are moved to a temporary history
+# file, from which they are read back when needed. History file has a
+# sparse index (offset of every Nth line) to find lines fast. History file
+# is also scanned by search in background (see scan()), so its access is
+# locked.
+#
+###############################################################################
+
+from collections import deque
+from threading import Lock
 
+class LineStore:
+
+    overhead = 100          # Approx. Python object overhead per line
+    stride   = 1024         # History file index density
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.lines = deque()
+        self.size = 0
+        self.history = None
+        self.spilled = 0
+        self.index = None
+        self.lock = Lock()
+
+    def __len__(self):
+        return self.spilled + len(self.lines)
+
+    def append(self, text, color):
+        self.lines.append((text, color))
+        self.size += len(text) + self.overhead
+        if self.size > self.memory: self.spill()
+
+    #--------------------------------------------------------------------------
+    # Move oldest lines (down to 3/4 of ceiling) to history file
     #--------------------------------------------------------------------------
-    # Commands
+
+    def spill(self):
+        from array import array
+        import tempfile
+
+        with self.lock:
+            if self.history is None:
+                self.history = tempfile.TemporaryFile()
+                self.index = array("Q")
+
+            self.history.seek(0, 2)
+            chunk = []
+            limit = self.memory * 3 // 4
+            while self.size > limit:
+                text, color = self.lines.popleft()
+                self.size -= len(text) + self.overhead
+                if self.spilled % self.stride == 0:
+                    if chunk: self.history.write(b"".join(chunk))
+                    chunk = []
+                    self.index.append(self.history.tell())
+                chunk.append(("%s\t%s\n" % (color, text)).encode("utf-8", "replace"))
+                self.spilled += 1
+            self.history.write(b"".join(chunk))
+
+    #--------------------------------------------------------------------------
+    # Get lines [first, first + count)
     #--------------------------------------------------------------------------
 
+    def get(self, first, count):
+        first = max(0, first)
+        last = min(len(self), first + count)
+        result = []
+
+        if first < self.spilled:
+            with self.lock:
+                self.history.seek(self.index[first // self.stride])
+                for i in range(first - first % self.stride, min(last, self.spilled)):
+                    line = self.history.readline()
+                    if i < first: continue
+                    color, text = line.decode("utf-8").rstrip("\n").split("\t", 1)
+                    result.append((text, color))
+            first = self.spilled
+
+        for i in range(first - self.spilled, last - self.spilled):
+            result.append(self.lines[i])
+        return result
+
     def clear(self):
-        self.logbox.clear()
-        self.watchbox.clear()
+        with self.lock:
+            if self.history is not None: self.history.close()
+        self.__init__(self.memory)
+
+    #--------------------------------------------------------------------------
+    # Scan lines [0, last) of history file, giving numbers of lines for
+    # which match(text) is true. Lock is taken per index block, so that the
+    # store can be used meanwhile. Stops when the store is cleared or
+    # cancelled() is true.
+    #--------------------------------------------------------------------------
+
+    def scan(self, match, last, cancelled = lambda: False):
+        history = self.history
+        last = min(last, self.spilled)
+        for block in range(0, (last + self.stride - 1) // self.stride):
+            first = block * self.stride
+            with self.lock:
+                if self.history is not history or cancelled(): return
+                history.seek(self.index[block])
+                lines = [history.readline() for i in range(min(self.stride, last - first))]
+            for i, line in enumerate(lines, first):
+                if match(line.decode("utf-8").rstrip("\n").split("\t", 1)[1]): yield i
+
+#------------------------------------------------------------------------------
+# Memory ceiling shared by line stores: each store gets an equal share,
+# and the shares are recomputed when stores are added or released.
+#------------------------------------------------------------------------------
+
+import weakref
+
+class Budget:
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.stores = weakref.WeakSet()
 
-    def build(self):
-        self.clear()
-        self.worker = Worker("scons", self.queue)
-        self.worker.start()
+    def store(self):
+        store = LineStore(self.memory)
+        self.stores.add(store)
+        self.share()
+        return store
+
+    def release(self, store):
+        self.stores.discard(store)
+        self.share()
+
+    def share(self):
+        memory = self.memory // max(1, len(self.stores))
+        for store in list(self.stores):
+            store.memory = memory
+            if store.size > memory: store.spill()
+
+###############################################################################
+#
+# Search index: Inverted index from lowercase word tokens to line numbers,
+# updated as lines arrive. Postings are appended in line order, so they are
+# sorted, and intersections can use binary search.
+#
+# Tokenizing is done in a background thread: extend() and forget() queue
+# the work to the indexer, which applies it in order. clear() is done at
+# once, and the work queued before it is skipped (generation). Work queue is
+# bounded, so when the indexer falls behind, the UI waits for it. Index
+# covers only the lines the line store keeps in memory: forget() drops
+# postings of lines moved to history file, so the index is bounded by the
+# memory budget. Older lines are searched by scanning the history file with
+# matcher(query).
+#
+# Query is a list of words, which all need to match. "word*" matches all
+# tokens starting with "word". Each channel has its own index (see
+# loggui.SessionView.search for "in:channel").
+#
+###############################################################################
+
+import re
+from array import array
+
+class Indexer(Thread):
+
+    def __init__(self):
+        super(Indexer, self).__init__(target = self.run)
+        self.daemon = True
+        self.work = Queue(256)
 
     def run(self):
-        self.clear()
-        self.worker = Worker(args.exe, self.queue)
-        self.worker.start()
+        while True:
+            self.work.get()()
 
-    def buildnrun(self):
-        self.clear()
-        self.worker = Worker("scons run", self.queue)
-        self.worker.start()
+class LineIndex:
 
-    def clean(self):
-        self.worker = Worker("scons -c", self.queue)
-        self.worker.start()
+    tokenize = re.compile(r"\w\w+").findall
+    indexer = None
 
-    def stop(self):
-        if platform.windows:
-            self.queue.put(("logger", "Windows: Stop not yet implemented.\n"))
-        elif self.worker is not None and self.worker.is_alive():
-            self.worker.stop()
-            self.worker.join()
-            self.worker = None
+    def __init__(self):
+        self.tokens = {}
+        self.first = 0
+        self.generation = 0
+        self.lock = Lock()
+
+    def post(self, work):
+        if LineIndex.indexer is None:
+            LineIndex.indexer = Indexer()
+            LineIndex.indexer.start()
+        LineIndex.indexer.work.put(work)
+
+    def extend(self, first, lines):
+        generation = self.generation
+        self.post(lambda: self.add(first, lines, generation))
+
+    def forget(self, first):
+        generation = self.generation
+        self.post(lambda: self.drop(first, generation))
+
+    def clear(self):
+        with self.lock:
+            self.tokens = {}
+            self.first = 0
+            self.generation += 1
 
     #--------------------------------------------------------------------------
-    # Stop thread & process when exiting
+    # Indexer thread
     #--------------------------------------------------------------------------
 
-    def on_close(self):
-        self.stop()
-        global root
-        root.destroy()
+    def add(self, first, lines, generation):
+        tokenize = self.tokenize
+        indexed = [set(tokenize(text.lower())) for text in lines]
+        with self.lock:
+            if generation != self.generation: return
+            tokens = self.tokens
+            for line, words in enumerate(indexed, first):
+                if line < self.first: continue
+                for token in words:
+                    try:
+                        tokens[token].append(line)
+                    except KeyError:
+                        tokens[token] = array("I", (line,))
+
+    def drop(self, first, generation):
+        from bisect import bisect_left
+        with self.lock:
+            if generation != self.generation or first <= self.first: return
+            self.first = first
+            for token, postings in list(self.tokens.items()):
+                i = bisect_left(postings, first)
+                if i == len(postings):
+                    del self.tokens[token]
+                elif i:
+                    del postings[:i]
+
+    #--------------------------------------------------------------------------
+
+    def postings(self, word):
+        from heapq import merge
+
+        if word.endswith("*"):
+            prefix = word[:-1].lower()
+            matches = [p for t, p in self.tokens.items() if t.startswith(prefix)]
+            if len(matches) < 2: return matches or [()]
+            merged = []
+            for line in merge(*matches):
+                if not merged or merged[-1] != line: merged.append(line)
+            return [merged]
+
+        return [self.tokens.get(token, ()) for token in self.tokenize(word.lower())]
+
+    def search(self, query, limit = 1000):
+        with self.lock:
+            return self.find(query, limit)
+
+    def matcher(self, query):
+        tokenize = self.tokenize
+        words = query.lower().split()
+        prefixes = [word[:-1] for word in words if word.endswith("*")]
+        required = set(token for word in words if not word.endswith("*") for token in tokenize(word))
+
+        def match(text):
+            tokens = set(tokenize(text.lower()))
+            return required <= tokens and all(any(t.startswith(p) for t in tokens) for p in prefixes)
+
+        return match
+
+    def find(self, query, limit):
+        from bisect import bisect_left
+
+        def contains(postings, line):
+            i = bisect_left(postings, line)
+            return i < len(postings) and postings[i] == line
+
+        lists = []
+        for word in query.split(): lists += self.postings(word)
+        if not lists: return []
+
+        lists.sort(key = len)
+        result = []
+        for line in lists[0]:
+            if all(contains(p, line) for p in lists[1:]):
+                result.append(line)
+                if len(result) >= limit: break
+        return result
 
 ###############################################################################
 #
+# Watch history: Numeric watch values (e.g. "12.3 ms") are stored to fixed
+# size ring buffers. Each level keeps (min, max, mean) of "factor" points
+# of the level below, so higher levels cover longer periods with the same
+# memory. Level 0 has the raw samples. Min and max are kept over the whole
+# run, p99 is taken from the raw samples, and sparkline shows the longest
+# period that fills its width.
 #
+###############################################################################
+
+number = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)").match
+
+class Series:
+
+    blocks = "\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+
+    def __init__(self, size, factor, levels):
+        self.size = size
+        self.factor = factor
+        self.lo  = [array("d", bytes(8 * size)) for i in range(levels)]
+        self.hi  = [array("d", bytes(8 * size)) for i in range(levels)]
+        self.avg = [array("d", bytes(8 * size)) for i in range(levels)]
+        self.count = [0] * levels
+        self.acc = [None] * levels
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+        self.put(0, value, value, value)
+
+    def put(self, level, lo, hi, avg):
+        i = self.count[level] % self.size
+        self.lo[level][i], self.hi[level][i], self.avg[level][i] = lo, hi, avg
+        self.count[level] += 1
+
+        level += 1
+        if level == len(self.count): return
+
+        acc = self.acc[level]
+        if acc is None:
+            acc = [lo, hi, avg, 1]
+        else:
+            acc = [min(acc[0], lo), max(acc[1], hi), acc[2] + avg, acc[3] + 1]
+
+        if acc[3] == self.factor:
+            self.put(level, acc[0], acc[1], acc[2] / acc[3])
+            acc = None
+        self.acc[level] = acc
+
+    #--------------------------------------------------------------------------
+    # Reading: window() gives the stored points of a level, oldest first,
+    # and level() the coarsest level with at least n points.
+    #--------------------------------------------------------------------------
+
+    def window(self, level = 0, which = "avg"):
+        data = getattr(self, which)[level]
+        count = self.count[level]
+        if count <= self.size: return data[:count]
+        i = count % self.size
+        return data[i:] + data[:i]
+
+    def level(self, n):
+        for level in reversed(range(len(self.count))):
+            if self.count[level] >= n: return level
+        return 0
+
+    def stats(self):
+        ordered = sorted(self.window(0))
+        if not ordered: return None
+        return self.min, self.max, ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+
+    def sparkline(self, width):
+        data = self.window(self.level(width))[-width:]
+        if not data: return ""
+        lo, hi = min(data), max(data)
+        scale = (len(self.blocks) - 1) / (hi - lo) if hi > lo else 0
+        return "".join(self.blocks[int((v - lo) * scale)] for v in data)
+
+#------------------------------------------------------------------------------
+# Series for all numeric watches
+#------------------------------------------------------------------------------
+
+class History(dict):
+
+    def add(self, channel, tag, value):
+        m = number(value)
+        if m is None: return None
+
+        series = self.get((channel, tag))
+        if series is None:
+            config = settings["History"]
+            series = self[(channel, tag)] = Series(config["size"], config["factor"], config["levels"])
+        series.add(float(m.group(1)))
+        return series
+
+###############################################################################
+#
+# Frame time analytics: Time values (ms) of designated perf channels go to
+# streaming histograms with HDR-style buckets. Each power of two is split
+# to 2^bits linear sub-buckets, so percentiles have bounded relative error
+# (below 2^-bits) and memory stays small regardless of the run length.
+#
+###############################################################################
+
+from math import frexp, ldexp, ceil
+
+class Histogram:
+
+    def __init__(self, bits):
+        self.sub = 1 << bits
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value > 0:
+            m, e = frexp(value)
+            key = e * self.sub + int((2 * m - 1) * self.sub)
+            try:
+                self.buckets[key] += 1
+            except KeyError:
+                self.buckets[key] = 1
+        else:
+            self.zeros += 1
+
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+
+    def upper(self, key):
+        e, s = divmod(key, self.sub)
+        return ldexp(0.5 * (1 + (s + 1) / self.sub), e)
+
+    #--------------------------------------------------------------------------
+    # Percentiles (fractions, ascending) in one pass over the buckets. Value
+    # is the upper bound of the bucket, clamped to the observed range.
+    #--------------------------------------------------------------------------
+
+    def percentiles(self, ps):
+        if not self.count: return [None] * len(ps)
+        ranks = [max(1, ceil(p * self.count)) for p in ps]
+        result = []
+        seen = self.zeros
+        keys = iter(sorted(self.buckets))
+        value = min(0.0, self.min)
+        for rank in ranks:
+            while seen < rank:
+                key = next(keys)
+                seen += self.buckets[key]
+                value = max(self.min, min(self.max, self.upper(key)))
+            result.append(value)
+        return result
+
+    def summary(self):
+        p50, p95, p99 = self.percentiles((0.50, 0.95, 0.99))
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": p50, "p95": p95, "p99": p99,
+            "max": self.max,
+        }
+
+#------------------------------------------------------------------------------
+# Histograms for time watches of perf channels
+#------------------------------------------------------------------------------
+
+class FrameStats(dict):
+
+    def add(self, channel, tag, value):
+        if channel not in settings["Perf"]["channels"]: return None
+        m = number(value)
+        if m is None or value[m.end():].strip() != "ms": return None
+
+        hist = self.get((channel, tag))
+        if hist is None:
+            hist = self[(channel, tag)] = Histogram(settings["Perf"]["bits"])
+        hist.add(float(m.group(1)))
+        return hist
+
+    def report(self):
+        lines = []
+        for (channel, tag), hist in sorted(self.items()):
+            s = hist.summary()
+            lines.append("%s:%s: n %d, mean %.2f ms, p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms" % (
+                channel, tag, s["count"], s["mean"], s["p50"], s["p95"], s["p99"], s["max"]
+            ))
+        return lines
+
+    def export(self, path):
+        import json
+        with open(path, "w") as f:
+            json.dump(
+                dict(("%s:%s" % key, hist.summary()) for key, hist in sorted(self.items())),
+                f, indent = 2
+            )
+
+###############################################################################
+#
+# Headless mode: run command, and write log lines to terminal or to files
+# (one file per channel). At exit, write the watch table and frame time
+# percentiles.
+#
+###############################################################################
+
+class Headless:
+
+    def __init__(self, args, recorder = None, meter = None):
+        self.recorder = recorder
+        self.meter = meter
+        self.channels = set(args.channel) if args.channel else None
+        self.outdir = args.output
+        self.watchfile = args.watch
+        self.perffile = args.perf
+        self.mutes = ["mute " + m.replace(":", " ", 1) for m in args.mute or ()]
+        self.files = {}
+        self.watches = {}
+        self.history = History()
+        self.frames = FrameStats()
+        self.dropped = 0
+
+    #--------------------------------------------------------------------------
+
+    def output(self, channel):
+        if self.outdir is None: return sys.stdout
+        if channel not in self.files:
+            name = "stdout" if channel is None else channel
+            self.files[channel] = open(os.path.join(self.outdir, name + ".log"), "w")
+        return self.files[channel]
+
+    def accept(self, channel):
+        if self.channels is None: return True
+        return ("-" if channel is None else channel) in self.channels
+
+    def write(self, channel, entry):
+        if not self.accept(channel): return
+        if channel is not None and self.outdir is None:
+            entry = "%s:%s" % (channel, entry)
+        self.output(channel).write(entry + "\n")
+
+    #--------------------------------------------------------------------------
+
+    def handle(self, batch):
+        started = perf_counter()
+        for kind, channel, tag, payload in batch:
+            if kind == "log":
+                self.write(channel, payload)
+            elif kind == "watch":
+                self.watches[(channel, tag)] = payload
+                self.history.add(channel, tag, payload)
+                self.frames.add(channel, tag, payload)
+            elif kind == "logger":
+                print("logger:", payload, file = sys.stderr)
+
+        if self.meter is not None:
+            now = perf_counter()
+            self.meter.tick(now - started)
+            self.meter.latency(now - batch.time)
+
+    def run(self, cmd):
+        if self.outdir is not None: os.makedirs(self.outdir, exist_ok = True)
+
+        queue = Queue()
+        supervisor = Supervisor(queue, self.recorder, self.meter, lambda: self.mutes)
+        supervisor.sink.block = True
+        supervisor.listen()
+        supervisor.start()
+        sid = supervisor.launch(cmd)
+
+        def follow():
+            while True:
+                batch = supervisor.sink.get()
+                self.handle(batch)
+                if batch.source == sid and batch[-1][0] == "eof": break
+
+        try:
+            follow()
+        except KeyboardInterrupt:
+            supervisor.stop(sid)
+            follow()
+
+        supervisor.wait(1.0)
+        supervisor.close()
+        while True:
+            try:
+                self.handle(supervisor.sink.get_nowait())
+            except Empty:
+                break
+        self.dropped = supervisor.sink.dropped
+        self.close()
+        return supervisor.sessions[sid].err
+
+    #--------------------------------------------------------------------------
+    # Print lines from recorded session
+    #--------------------------------------------------------------------------
+
+    def replay(self, reader, first, count):
+        for kind, channel, payload, ms in reader.log(first, count):
+            if kind == "log": self.write(channel, payload)
+        self.watches = reader.watches(first + count - 1)
+        self.close()
+        return 0
+
+    #--------------------------------------------------------------------------
+
+    def close(self):
+        for f in self.files.values(): f.close()
+
+        if self.watchfile is None:
+            f = sys.stdout
+        else:
+            f = open(self.watchfile, "w")
+
+        for (channel, tag), value in sorted(self.watches.items(), key = lambda w: (w[0][0] or "", w[0][1])):
+            series = self.history.get((channel, tag))
+            if channel is not None: tag = "%s:%s" % (channel, tag)
+            if series is None:
+                f.write("%-40s %s\n" % (tag, value))
+            else:
+                f.write("%-40s %-20s min %-10g max %-10g p99 %g\n" % ((tag, value) + series.stats()))
+
+        for line in self.frames.report(): f.write(line + "\n")
+
+        if f is not sys.stdout: f.close()
+        if self.perffile is not None: self.frames.export(self.perffile)
+
+###############################################################################
+#
+# Parse arguments
 #
 ###############################################################################
 
-import os
+def parseargs():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-C",   type=str, metavar="<dir>", dest="cwd", default = None, help = "Specify working directory")
+    parser.add_argument("--headless", action="store_true", help = "Run without window, write output to terminal or files")
+    parser.add_argument("--channel", type=str, metavar="<name>", action="append", help = "Headless: show only this channel ('-' for plain lines), can be repeated")
+    parser.add_argument("--output", type=str, metavar="<dir>", default = None, help = "Headless: write channels to files in directory")
+    parser.add_argument("--watch", type=str, metavar="<file>", default = None, help = "Headless: write watch table to file at exit")
+    parser.add_argument("--perf", type=str, metavar="<file>", default = None, help = "Headless: write frame time percentiles (JSON) at exit")
+    parser.add_argument("--mute", type=str, metavar="<log|watch>:<name>", action="append", help = "Headless: mute channel at game side, can be repeated")
+    parser.add_argument("--socket", type=str, metavar="<path>", default = None, help = "Listen game connections at this Unix socket")
+    parser.add_argument("--no-socket", action="store_true", help = "Don't listen game connections, use stdout only")
+    parser.add_argument("--record", type=str, metavar="<file>", default = None, help = "Record session to file")
+    parser.add_argument("--replay", type=str, metavar="<file>", default = None, help = "Open recorded session")
+    parser.add_argument("--goto", type=str, metavar="<pos>", default = "0", help = "Replay: start from line number, or time (e.g. 12.5s)")
+    parser.add_argument("--count", type=int, metavar="<n>", default = 100, help = "Headless replay: number of lines to print")
+    parser.add_argument("exe", type=str, nargs="?", default = "scons run", help = "Specify binary file")
 
-root = Tk()
-root.title("Logger: {}".format(os.getcwd()))
-root.geometry(settings["MainWindow"]["geometry"])
-main = MainWindow(root)
-root.protocol("WM_DELETE_WINDOW", main.on_close)
-root.mainloop()
+    return parser.parse_args()
+
+#------------------------------------------------------------------------------
+
+def main():
+    args = parseargs()
+
+    if args.cwd != None:
+        os.chdir(args.cwd)
+
+    if args.socket is not None: settings["Socket"]["path"] = args.socket
+    if args.no_socket: settings["Socket"]["listen"] = False
+
+    if args.replay is not None:
+        from logsession import SessionReader, position
+        try:
+            reader = SessionReader(args.replay)
+            first = position(reader, args.goto)
+        except (OSError, ValueError) as e:
+            print("logger:", e, file = sys.stderr)
+            sys.exit(2)
+        if args.headless:
+            sys.exit(Headless(args).replay(reader, first, args.count))
+        from loggui import gui
+        gui(args, reader = reader, first = first)
+        return
+
+    recorder = None
+    if args.record is not None:
+        from logsession import Recorder
+        recorder = Recorder(args.record)
+
+    try:
+        if args.headless:
+            sys.exit(Headless(args, recorder).run(args.exe))
+        else:
+            from loggui import gui
+            gui(args, recorder = recorder)
+    finally:
+        if recorder is not None: recorder.close()
+
+#------------------------------------------------------------------------------
+# When run as script, import ourselves as module, so that loggui and other
+# tools share the same module instance.
+#------------------------------------------------------------------------------
 
+if __name__ == "__main__":
+    import logger
+    logger.main()
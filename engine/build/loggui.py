@@ -0,0 +1,722 @@
+###############################################################################
+#
+# Logger GUI. This is imported by logger.py only when running with window,
+# so that headless runs do not need Tk at all.
+#
+###############################################################################
+
+from logger import *
+
+from   tkinter import *
+import tkinter.ttk as ttk
+
+#------------------------------------------------------------------------------
+# Log view shows lines from line store. Only the visible lines are put to
+# the text widget, so the widget stays small regardless of the log size.
+# Line store takes its memory from budget shared with other views.
+#------------------------------------------------------------------------------
+
+class LogView(Frame):
+
+    def __init__(self, master, budget = None, **kw):
+        super(LogView, self).__init__(master)
+
+        self.budget = budget
+        self.store = budget.store() if budget is not None else LineStore(settings["LogView"]["memory"])
+        self.index = LineIndex() if settings["Search"]["index"] else None
+        self.first = 0
+        self.rows = 1
+        self.follow = True
+        self.shown = True
+
+        self.vbar = Scrollbar(self, command = self.scroll)
+        self.vbar.pack(side = RIGHT, fill = Y)
+        self.text = Text(self)
+        self.text.configure(kw)
+        self.text.pack(side = LEFT, fill = BOTH, expand = 1)
+
+        self.text.bind("<Configure>", self.resize)
+        self.text.bind("<MouseWheel>", lambda e: self.scroll("scroll", -e.delta // 120, "units"))
+        self.text.bind("<Button-4>", lambda e: self.scroll("scroll", -3, "units"))
+        self.text.bind("<Button-5>", lambda e: self.scroll("scroll", 3, "units"))
+
+    def tag_config(self, *args, **kw):
+        return self.text.tag_config(*args, **kw)
+
+    def add(self, tab, tag, entry, color):
+        self.extend([(tab, entry, color)])
+
+    def extend(self, entries):
+        if not entries: return
+
+        first, spilled = len(self.store), self.store.spilled
+        lines = []
+        for tab, entry, color in entries:
+            if tab is not None: entry = "%s:%s" % (tab, entry)
+            for line in entry.split("\n"):
+                self.store.append(line, color)
+                lines.append(line)
+
+        if self.index is not None:
+            self.index.extend(first, lines)
+            if self.store.spilled > spilled: self.index.forget(self.store.spilled)
+
+        if not self.shown: return
+        if self.follow:
+            self.first = max(0, len(self.store) - self.rows)
+            self.render()
+        else:
+            self.update_vbar()
+
+    #--------------------------------------------------------------------------
+    # Hidden view only stores lines, and renders when shown again.
+    #--------------------------------------------------------------------------
+
+    def show(self, shown):
+        self.shown = shown
+        if not shown: return
+        if self.follow: self.first = max(0, len(self.store) - self.rows)
+        self.render()
+
+    def clear(self):
+        self.store.clear()
+        if self.index is not None: self.index.clear()
+        self.first = 0
+        self.follow = True
+        self.render()
+
+    def destroy(self):
+        if self.budget is not None: self.budget.release(self.store)
+        super(LogView, self).destroy()
+
+    #--------------------------------------------------------------------------
+    # Scrolling
+    #--------------------------------------------------------------------------
+
+    def resize(self, event):
+        from tkinter.font import Font
+        linespace = Font(font = self.text.cget("font")).metrics("linespace")
+        self.rows = max(1, event.height // linespace)
+        if self.follow: self.first = max(0, len(self.store) - self.rows)
+        self.render()
+
+    def scroll(self, action, amount, unit = None):
+        total = len(self.store)
+        if action == "moveto":
+            first = int(float(amount) * total)
+        elif unit == "pages":
+            first = self.first + int(amount) * self.rows
+        else:
+            first = self.first + int(amount)
+
+        self.goto(first)
+
+    def goto(self, first):
+        total = len(self.store)
+        self.first = max(0, min(first, total - self.rows))
+        self.follow = self.first + self.rows >= total
+        self.render()
+
+    #--------------------------------------------------------------------------
+    # Put visible lines to text widget, merging lines of same color to one
+    # text chunk, and insert it with single call.
+    #--------------------------------------------------------------------------
+
+    def render(self):
+        runs = []
+        for text, color in self.store.get(self.first, self.rows):
+            if runs and runs[-1][0] == color:
+                runs[-1][1].append(text)
+            else:
+                runs.append((color, [text]))
+
+        chunks = []
+        for color, texts in runs:
+            chunks += ["\n".join(texts) + "\n", color]
+
+        self.text.config(state = NORMAL)
+        self.text.delete("1.0", END)
+        if chunks: self.text.insert(END, *chunks)
+        self.text.config(state = DISABLED)
+        if self.follow: self.text.see(END)
+        self.update_vbar()
+
+    def update_vbar(self):
+        total = len(self.store)
+        if total:
+            self.vbar.set(self.first / total, min(1.0, (self.first + self.rows) / total))
+        else:
+            self.vbar.set(0.0, 1.0)
+
+#------------------------------------------------------------------------------
+# Listbox for updated values
+#------------------------------------------------------------------------------
+
+class WatchView(ttk.Treeview):
+
+    def __init__(self, master, **kw):
+        super(WatchView, self).__init__(master)
+        self.configure(kw)
+        self.configure(columns=("Value", "History", "Min", "Max", "P99"))
+
+        self.heading("#0", text="Tag")
+        self.heading("#1", text="Value")
+        self.heading("#2", text="History")
+        self.heading("#3", text="Min")
+        self.heading("#4", text="Max")
+        self.heading("#5", text="P99")
+        self.column("#0", anchor="w", stretch=YES)
+        self.column("#1", anchor="e", stretch=NO, width=100)
+        self.column("#2", anchor="w", stretch=NO, width=8 * settings["History"]["sparkline"])
+        for col in ("#3", "#4", "#5"):
+            self.column(col, anchor="e", stretch=NO, width=60)
+
+        self.index = {}
+        self.pending = {}
+        self.history = History()
+        self.frames = FrameStats()
+
+    #--------------------------------------------------------------------------
+    # Updates are only collected here (numeric values go to history, frame
+    # times to histograms), and flush() applies the latest value of each
+    # tag once per UI tick. Frame times get percentile rows below the tag.
+    #--------------------------------------------------------------------------
+
+    def add(self, tab, tag, entry, color):
+        self.pending[(tab, tag)] = (
+            entry,
+            self.history.add(tab, tag, entry),
+            self.frames.add(tab, tag, entry),
+        )
+
+    def flush(self):
+        for (tab, tag), (entry, series, hist) in self.pending.items():
+            gid = "" if tab is None else tab
+            iid = gid + ":" + tag
+
+            value = self.index.get(iid)
+            if value == entry and series is None: continue
+
+            if series is None:
+                values = (entry,)
+            else:
+                values = (entry, series.sparkline(settings["History"]["sparkline"])) + tuple(
+                    "%.4g" % v for v in series.stats()
+                )
+
+            if value is None:
+                if gid and gid not in self.index:
+                    self.insert('', END, iid = gid, text = tab, open = True)
+                    self.index[gid] = ""
+                self.insert(gid, END, iid = iid, text = tag, values = values, open = hist is not None)
+            else:
+                self.item(iid, values = values)
+            self.index[iid] = entry
+
+            if hist is not None: self.percentiles(iid, hist)
+
+        self.pending = {}
+
+    def percentiles(self, iid, hist):
+        values = hist.percentiles((0.50, 0.95, 0.99)) + [hist.max]
+        for name, value in zip(("p50", "p95", "p99", "max"), values):
+            cid = iid + "/" + name
+            if cid in self.index:
+                self.item(cid, values = ("%.2f ms" % value,))
+            else:
+                self.insert(iid, END, iid = cid, text = name, values = ("%.2f ms" % value,))
+                self.index[cid] = ""
+
+    def clear(self):
+        self.delete(*self.get_children())
+        self.index = {}
+        self.pending = {}
+        self.history.clear()
+        self.frames.clear()
+
+#------------------------------------------------------------------------------
+# Search result list. Lines are line numbers of the rows, None for notes.
+# Lines no longer in the store (cleared meanwhile) are left out.
+#------------------------------------------------------------------------------
+
+class Results(Listbox):
+
+    def __init__(self, master, **kw):
+        super(Results, self).__init__(master, **kw)
+        self.lines = []
+        self.logbox = None
+
+    def show(self, logbox, lines, note = None):
+        if logbox is not None: lines = [line for line in lines if line < len(logbox.store)]
+        self.delete(0, END)
+        self.logbox = logbox
+        self.lines = ([None] if note else []) + lines
+        if note: self.insert(END, note)
+        if lines: self.insert(END, *["%8d: %s" % (line, logbox.store.get(line, 1)[0][0]) for line in lines])
+        if not lines and not note: self.insert(END, "No matches.")
+
+#------------------------------------------------------------------------------
+# Session view: log, search results and watches of one process (or
+# attached game).
+#------------------------------------------------------------------------------
+
+class SessionView(Frame):
+
+    def __init__(self, master, sid, store = None, budget = None):
+        super(SessionView, self).__init__(master)
+        self.sid = sid
+        self.store = store
+        self.budget = budget
+        self.pending = {}
+        self.logs = {}
+        self.shown = True
+
+        paned = PanedWindow(self, orient = HORIZONTAL)
+        paned.pack(fill = BOTH, expand = 1)
+
+        left = PanedWindow(paned, orient = VERTICAL)
+        paned.add(left, stretch = "always")
+
+        self.notebook = ttk.Notebook(left)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.switch())
+        left.add(self.notebook, stretch = "always")
+
+        self.results = Results(left, height = 6)
+        self.results.bind("<<ListboxSelect>>", self.jump)
+        self.scanning = None
+        if store is None: left.add(self.results, stretch = "never")
+
+        self.watchbox = WatchView(paned)
+        paned.add(self.watchbox)
+
+        self.log(None)
+
+    #--------------------------------------------------------------------------
+    # Channel tabs: Each log channel gets a tab when it first appears, plain
+    # lines and logger's messages go to "Output". Hidden tabs only store
+    # the lines, and render when selected. Watches are applied only when
+    # the session is shown.
+    #--------------------------------------------------------------------------
+
+    def log(self, channel):
+        logbox = self.logs.get(channel)
+        if logbox is None:
+            logbox = self.logs[channel] = LogView(self.notebook, self.budget, state = DISABLED, wrap=WORD)
+            logbox.tag_config("stdout")
+            logbox.tag_config("logger", foreground="blue")
+            if self.store is not None: logbox.store, logbox.index = self.store, None
+            self.notebook.add(logbox, text = "Output" if channel is None else channel)
+            logbox.show(self.shown and logbox is self.current())
+        return logbox
+
+    def current(self):
+        return self.nametowidget(self.notebook.select())
+
+    def add(self, channel, entry, color):
+        try:
+            self.pending[channel].append((None, entry, color))
+        except KeyError:
+            self.pending[channel] = [(None, entry, color)]
+
+    def switch(self):
+        current = self.current()
+        for logbox in self.logs.values():
+            logbox.show(self.shown and logbox is current)
+
+    def show(self, shown):
+        self.shown = shown
+        self.switch()
+        if shown: self.watchbox.flush()
+
+    def flush(self):
+        for channel, entries in self.pending.items():
+            self.log(channel).extend(entries)
+        self.pending = {}
+        if self.shown: self.watchbox.flush()
+
+    def clear(self):
+        for logbox in self.logs.values(): logbox.clear()
+        self.watchbox.clear()
+        self.scanning = None
+        self.results.delete(0, END)
+        self.results.lines = []
+
+    #--------------------------------------------------------------------------
+    # Search: show matching lines of current channel in result list, and
+    # jump to line when selected. "in:channel" searches the tab of that
+    # channel instead ("in:-" for Output). Index has only the lines kept in
+    # memory: lines moved to history file are scanned in background thread,
+    # and added to the results when the scan is done.
+    #--------------------------------------------------------------------------
+
+    def search(self, query):
+        words = query.split()
+        channels = set(word[3:] for word in words if word.startswith("in:"))
+        query = " ".join(word for word in words if not word.startswith("in:"))
+
+        if not channels:
+            logbox = self.current()
+        elif len(channels) == 1:
+            channel = channels.pop()
+            logbox = self.logs.get(None if channel == "-" else channel)
+        else:
+            logbox = None
+
+        self.scanning = None
+        limit = settings["Search"]["results"]
+        if logbox is None or logbox.index is None:
+            self.results.show(logbox, [])
+        elif not query:
+            self.results.show(logbox, list(range(min(len(logbox.store), limit))))
+        else:
+            older = logbox.store.spilled
+            lines = [line for line in logbox.index.search(query, limit) if line >= older]
+            if older:
+                self.results.show(logbox, lines, "Scanning lines 0-%d..." % (older - 1))
+                self.scan(logbox, logbox.index.matcher(query), older, lines, limit)
+            else:
+                self.results.show(logbox, lines)
+
+    def scan(self, logbox, match, older, lines, limit):
+        from threading import Thread
+
+        token = self.scanning = object()
+        found = []
+
+        def run():
+            result = []
+            for line in logbox.store.scan(match, older, lambda: self.scanning is not token):
+                result.append(line)
+                if len(result) >= limit: break
+            found.append(result)
+
+        def poll():
+            if self.scanning is not token: return
+            if found:
+                self.scanning = None
+                self.results.show(logbox, (found[0] + lines)[:limit])
+            else:
+                self.after(100, poll)
+
+        Thread(target = run, daemon = True).start()
+        self.after(100, poll)
+
+    def jump(self, event):
+        selected = self.results.curselection()
+        logbox = self.results.logbox
+        if selected and selected[0] < len(self.results.lines) and self.results.lines[selected[0]] is not None:
+            self.notebook.select(logbox)
+            logbox.goto(self.results.lines[selected[0]] - logbox.rows // 2)
+
+#------------------------------------------------------------------------------
+# Main window has a tab for each session. Build, Run etc. restart the
+# process in the current tab, Start runs the command in a new tab.
+#------------------------------------------------------------------------------
+
+class MainWindow(Frame):
+
+    def __init__(self, master, exe, recorder = None, reader = None):
+        super(MainWindow, self).__init__(master, padx = 5, pady = 5)
+        self.exe = exe
+        self.recorder = recorder
+        self.reader = reader
+
+        self.btnbar = Frame(self)
+        if reader is None:
+            Button(self.btnbar, text = "Build", command = self.build).pack(side=LEFT)
+            Button(self.btnbar, text = "Run", command = self.run).pack(side=LEFT)
+            Button(self.btnbar, text = "Build & Run", command = self.buildnrun).pack(side=LEFT)
+            Button(self.btnbar, text = "Clean", command = self.clean).pack(side=LEFT)
+            Button(self.btnbar, text = "Stop", command = self.stop).pack(side=LEFT)
+            Button(self.btnbar, text = "Restart", command = self.restart).pack(side=LEFT)
+            ttk.Separator(self.btnbar, orient=VERTICAL).pack(side=LEFT, fill = Y, padx = 5)
+            self.command = Entry(self.btnbar, width = 20)
+            self.command.insert(0, exe)
+            self.command.pack(side=LEFT)
+            self.command.bind("<Return>", lambda e: self.new(self.command.get()))
+            Button(self.btnbar, text = "Start", command = lambda: self.new(self.command.get())).pack(side=LEFT)
+            Button(self.btnbar, text = "Close", command = self.close_tab).pack(side=LEFT)
+            ttk.Separator(self.btnbar, orient=VERTICAL).pack(side=LEFT, fill = Y, padx = 5)
+            Button(self.btnbar, text = "Clear", command = self.clear).pack(side=LEFT)
+            ttk.Separator(self.btnbar, orient=VERTICAL).pack(side=LEFT, fill = Y, padx = 5)
+            channels = Menubutton(self.btnbar, text = "Channels", relief = RAISED)
+            self.channelmenu = Menu(channels, tearoff = 0)
+            channels["menu"] = self.channelmenu
+            channels.pack(side=LEFT)
+            ttk.Separator(self.btnbar, orient=VERTICAL).pack(side=LEFT, fill = Y, padx = 5)
+            self.query = Entry(self.btnbar, width = 30)
+            self.query.pack(side=LEFT)
+            self.query.bind("<Return>", lambda e: self.search())
+            Button(self.btnbar, text = "Search", command = self.search).pack(side=LEFT)
+        else:
+            Label(self.btnbar, text = "Go to (line, or time e.g. 12.5s):").pack(side=LEFT)
+            self.position = Entry(self.btnbar, width = 12)
+            self.position.pack(side=LEFT)
+            self.position.bind("<Return>", lambda e: self.goto(self.position.get()))
+            Button(self.btnbar, text = "Go", command = lambda: self.goto(self.position.get())).pack(side=LEFT)
+        self.btnbar.pack(side=TOP, anchor="w")
+
+        self.tabs = ttk.Notebook(self)
+        self.tabs.pack(fill = BOTH, expand = 1)
+        self.tabs.bind("<<NotebookTabChanged>>", lambda e: self.switch())
+        self.views = {}
+        self.closed = set()
+
+        self.pack(fill=BOTH, expand=1)
+
+        self.queue = Queue()
+        self.dropped = 0
+        self.channels = {}
+        self.muted = ()
+        self.meter = Meter()
+        self.reported = perf_counter()
+        self.supervisor = None
+        self.budget = Budget(settings["LogView"]["memory"])
+
+        if reader is not None:
+            from logsession import SessionStore
+            view = SessionView(self.tabs, None, SessionStore(reader))
+            self.tabs.add(view, text = os.path.basename(reader.path))
+        else:
+            self.supervisor = Supervisor(self.queue, recorder, self.meter, self.mutes)
+            self.supervisor.listen()
+            self.supervisor.start()
+        self.check()
+
+    #--------------------------------------------------------------------------
+    # Tabs: Tab is created when the first batch from session arrives (or
+    # when we start the process). Batches from closed tabs are ignored.
+    #--------------------------------------------------------------------------
+
+    def view(self, sid):
+        view = self.views.get(sid)
+        if view is None and sid not in self.closed:
+            view = self.views[sid] = SessionView(self.tabs, sid, budget = self.budget)
+            self.tabs.add(view, text = self.title(sid))
+        return view
+
+    def current(self):
+        if not self.tabs.tabs(): return None
+        return self.nametowidget(self.tabs.select())
+
+    def switch(self):
+        current = self.current()
+        for view in self.views.values(): view.show(view is current)
+
+    def title(self, sid, status = None):
+        session = self.supervisor.sessions.get(sid)
+        name = session.name if session is not None else "session %d" % sid
+        if len(name) > 30: name = name[:27] + "..."
+        if status is not None: name = "%s [%s]" % (name, status)
+        return name
+
+    #--------------------------------------------------------------------------
+    # Periodic update: process queued batches until time budget is used, and
+    # write collected log lines to log views at once. If there is still
+    # lines left, reschedule immediately to let Tk process its events.
+    #--------------------------------------------------------------------------
+
+    def check(self):
+        started = perf_counter()
+        deadline = started + settings["Ingest"]["budget"]
+        readtimes = []
+
+        while self.supervisor is not None and perf_counter() < deadline:
+            try:
+                batch = self.supervisor.sink.get_nowait()
+            except Empty:
+                break
+
+            readtimes.append(batch.time)
+            view = self.view(batch.source)
+            if view is None: continue
+
+            for kind, channel, tag, payload in batch:
+                if channel is not None and (kind, channel) not in self.channels:
+                    self.add_channel(kind, channel)
+
+                if kind == "log":
+                    view.add(channel, payload, "stdout")
+                elif kind == "watch":
+                    view.watchbox.add(channel, tag, payload, "stdout")
+                elif kind == "logger":
+                    view.add(None, payload, "logger")
+                elif kind == "eof":
+                    self.report_dropped()
+                    for line in view.watchbox.frames.report(): view.add(None, line, "logger")
+                    view.add(None, "Done.\n", "logger")
+                    session = self.supervisor.sessions.get(view.sid)
+                    if session is not None and not session.running:
+                        status = "done" if not session.err else "exit %d" % session.err
+                        self.tabs.tab(view, text = self.title(view.sid, status))
+
+        self.report_dropped()
+        for view in self.views.values():
+            if view.pending or view.watchbox.pending: view.flush()
+
+        self.diagnostics(started, readtimes)
+
+        if self.queue.qsize():
+            self.master.after(1, self.check)
+        else:
+            self.master.after(settings["Ingest"]["interval"], self.check)
+
+    #--------------------------------------------------------------------------
+    # Logger's own diagnostics to "Logger" watch channel of the current tab,
+    # once per second
+    #--------------------------------------------------------------------------
+
+    def diagnostics(self, started, readtimes):
+        now = perf_counter()
+        self.meter.tick(now - started)
+        for t in readtimes: self.meter.latency(now - t)
+
+        if self.reader is not None or now - self.reported < 1.0: return
+        self.reported = now
+
+        report = self.meter.report(self.queue.qsize())
+        view = self.current()
+        if view is None: return
+        for tag, value in report:
+            view.watchbox.add("Logger", tag, value, "logger")
+        view.watchbox.flush()
+
+    def report_dropped(self):
+        if self.supervisor is None: return
+        dropped = self.supervisor.sink.dropped - self.dropped
+        view = self.current()
+        if dropped and view is not None:
+            self.dropped += dropped
+            view.add(None, "Dropped %d lines." % dropped, "logger")
+
+    #--------------------------------------------------------------------------
+    # Commands
+    #--------------------------------------------------------------------------
+
+    def clear(self):
+        view = self.current()
+        if view is not None: view.clear()
+
+    def start(self, cmd):
+        view = self.current()
+        if view is None or not self.supervisor.restart(view.sid, cmd):
+            self.new(cmd)
+        else:
+            self.tabs.tab(view, text = self.title(view.sid))
+
+    def new(self, cmd):
+        if not cmd.strip(): return
+        view = self.view(self.supervisor.launch(cmd))
+        self.tabs.select(view)
+
+    def restart(self):
+        view = self.current()
+        if view is not None and self.supervisor.restart(view.sid):
+            self.tabs.tab(view, text = self.title(view.sid))
+
+    def close_tab(self):
+        view = self.current()
+        if view is None: return
+        self.supervisor.forget(view.sid)
+        self.closed.add(view.sid)
+        del self.views[view.sid]
+        self.tabs.forget(view)
+        view.destroy()
+
+    #--------------------------------------------------------------------------
+    # Channels: Unchecking channel in the menu sends mute command to games,
+    # so that they stop writing lines to that channel. Mutes are sent again
+    # when a game is restarted. Supervisor reads the mutes from its own
+    # thread, so they are kept in a plain tuple, not in Tk variables.
+    #--------------------------------------------------------------------------
+
+    def add_channel(self, kind, channel):
+        var = BooleanVar(value = True)
+        self.channels[(kind, channel)] = var
+        if self.reader is not None: return
+        self.channelmenu.add_checkbutton(
+            label = "%s: %s" % ("Log" if kind == "log" else "Watch", channel),
+            variable = var,
+            command = lambda: self.toggle(kind, channel, var.get())
+        )
+
+    def toggle(self, kind, channel, enabled):
+        command = "%s %s %s" % ("unmute" if enabled else "mute", kind, channel)
+        self.muted = tuple("mute %s %s" % key for key, var in self.channels.items() if not var.get())
+        self.supervisor.broadcast(command)
+
+    def mutes(self):
+        return self.muted
+
+    #--------------------------------------------------------------------------
+
+    def search(self):
+        view = self.current()
+        if view is not None: view.search(self.query.get())
+
+    #--------------------------------------------------------------------------
+    # Replay: jump to line or time, and show watch values at that point
+    #--------------------------------------------------------------------------
+
+    def goto(self, text):
+        from logsession import position
+        try:
+            line = position(self.reader, text)
+        except ValueError:
+            return
+
+        view = self.current()
+        view.current().goto(line)
+        view.watchbox.clear()
+        for (channel, tag), value in self.reader.watches(line).items():
+            view.watchbox.add(channel, tag, value, "stdout")
+        view.watchbox.flush()
+
+    def build(self):
+        self.clear()
+        self.start("scons")
+
+    def run(self):
+        self.clear()
+        self.start(self.exe)
+
+    def buildnrun(self):
+        self.clear()
+        self.start("scons run")
+
+    def clean(self):
+        self.start("scons -c")
+
+    def stop(self):
+        view = self.current()
+        if view is not None: self.supervisor.stop(view.sid)
+
+    #--------------------------------------------------------------------------
+    # Stop processes & supervisor when exiting
+    #--------------------------------------------------------------------------
+
+    def on_close(self):
+        if self.supervisor is not None: self.supervisor.close()
+        self.master.destroy()
+
+###############################################################################
+#
+# Run GUI
+#
+###############################################################################
+
+def gui(args, recorder = None, reader = None, first = 0):
+    root = Tk()
+    if reader is None:
+        root.title("Logger: {}".format(os.getcwd()))
+    else:
+        root.title("Logger: {}".format(args.replay))
+    root.geometry(settings["MainWindow"]["geometry"])
+    main = MainWindow(root, args.exe, recorder, reader)
+    if reader is not None:
+        root.update_idletasks()
+        main.goto(str(first))
+    root.protocol("WM_DELETE_WINDOW", main.on_close)
+    root.mainloop()
+
+
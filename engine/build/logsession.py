@@ -0,0 +1,328 @@
+###############################################################################
+#
+# Logger sessions: Record everything coming from workers to an append-only
+# session file, and open recorded sessions for replay.
+#
+# Session file starts with magic, followed by records:
+#
+#   <kind:u8> <time:u32 ms> <len channel:u16> <len tag:u16> <len payload:u32>
+#   <channel> <tag> <payload>
+#
+# Strings are UTF-8, length 0xFFFF marks channel/tag None. Every Nth record
+# an index entry (record number, log line number, time, file offset) is
+# appended to side file <session>.idx. If the index is missing or broken,
+# it is rebuilt by scanning the session.
+#
+# Every Mth index entry, a snapshot of all watch values is appended to side
+# file <session>.wat (one JSON object per line), so that watches at any
+# line are found by scanning from the nearest snapshot. Missing snapshots
+# are rebuilt by scanning, too.
+#
+###############################################################################
+
+import struct, json
+from threading import Lock
+
+magic = b"LOGSES1\n"
+
+kinds = ("log", "watch", "logger", "eof")
+codes = dict((kind, code) for code, kind in enumerate(kinds))
+
+header = struct.Struct("<BIHHI")
+entry  = struct.Struct("<QQIQ")
+
+stride   = 1024
+snapshot = 16 * stride
+NONE     = 0xFFFF
+
+#------------------------------------------------------------------------------
+
+def encode(s):
+    if s is None: return b""
+    return s.encode("utf-8", "replace")
+
+def decode(data, length):
+    if length == NONE: return None
+    return data.decode("utf-8", "replace")
+
+###############################################################################
+#
+# Recording
+#
+###############################################################################
+
+class Recorder:
+
+    def __init__(self, path):
+        from time import monotonic
+
+        self.clock = monotonic
+        self.started = monotonic()
+        self.lock = Lock()
+        self.f = open(path, "wb", buffering = 1 << 20)
+        self.idx = open(path + ".idx", "wb", buffering = 0)
+        self.wat = open(path + ".wat", "w")
+        self.f.write(magic)
+        self.offset = len(magic)
+        self.records = 0
+        self.lines = 0
+        self.watches = {}
+
+    def write(self, batch):
+        with self.lock:
+            ms = int(1000 * (self.clock() - self.started)) & 0xFFFFFFFF
+            chunks = []
+
+            for kind, channel, tag, payload in batch:
+                if self.records % stride == 0:
+                    if chunks: self.f.write(b"".join(chunks))
+                    chunks = []
+                    self.idx.write(entry.pack(self.records, self.lines, ms, self.offset))
+                if self.records % snapshot == 0:
+                    self.wat.write(dumpsnapshot(self.records, self.lines, self.offset, self.watches))
+                    self.wat.flush()
+
+                c, t, p = encode(channel), encode(tag), encode(payload)
+                chunk = header.pack(
+                    codes[kind], ms,
+                    NONE if channel is None else len(c),
+                    NONE if tag is None else len(t),
+                    len(p)
+                ) + c + t + p
+                chunks.append(chunk)
+
+                self.offset += len(chunk)
+                self.records += 1
+                if kind == "watch":
+                    self.watches[(channel, tag)] = payload
+                else:
+                    self.lines += 1
+
+            self.f.write(b"".join(chunks))
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+            self.idx.close()
+            self.wat.close()
+
+#------------------------------------------------------------------------------
+# Watch snapshots: (records, lines, offset, values) at record boundary,
+# values maps (channel, tag) to payload.
+#------------------------------------------------------------------------------
+
+def dumpsnapshot(records, lines, offset, values):
+    return json.dumps({
+        "records": records,
+        "lines": lines,
+        "offset": offset,
+        "values": [[channel, tag, payload] for (channel, tag), payload in values.items()],
+    }) + "\n"
+
+def loadsnapshot(line):
+    data = json.loads(line)
+    values = dict(((channel, tag), payload) for channel, tag, payload in data["values"])
+    return data["records"], data["lines"], data["offset"], values
+
+###############################################################################
+#
+# Replaying: Session file is memory mapped, and index is used to find the
+# nearest record before the requested line or time.
+#
+###############################################################################
+
+class SessionReader:
+
+    def __init__(self, path):
+        import mmap, os
+
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < len(magic):
+                raise ValueError("%s: Empty session file (logger was killed before writing it?)" % path)
+            self.mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+        if self.mm[:len(magic)] != magic:
+            self.mm.close()
+            raise ValueError("%s: Not a session file" % path)
+
+        self.index, self.lines = self.load(path + ".idx")
+        self.linekeys = [e[1] for e in self.index]
+        self.timekeys = [e[2] for e in self.index]
+        self.snapshots = self.loadsnapshots(path + ".wat")
+        self.snapkeys = [s[1] for s in self.snapshots]
+
+    #--------------------------------------------------------------------------
+    # Load index, and continue it from the last valid entry to the end of
+    # file (which also handles missing index and unclean shutdowns).
+    #--------------------------------------------------------------------------
+
+    def load(self, path):
+        index = []
+        try:
+            data = open(path, "rb").read()
+            for i in range(0, len(data) - entry.size + 1, entry.size):
+                e = entry.unpack_from(data, i)
+                if e[3] >= len(self.mm): break
+                index.append(e)
+        except OSError:
+            pass
+
+        if not index: index = [(0, 0, 0, len(magic))]
+
+        records, lines, ms, offset = index[-1]
+        for offset, kind, ms, channel, tag, payload in self.scan(offset):
+            if records % stride == 0 and offset != index[-1][3]:
+                index.append((records, lines, ms, offset))
+            records += 1
+            if kind != "watch": lines += 1
+
+        return index, lines
+
+    #--------------------------------------------------------------------------
+    # Load watch snapshots, and continue them from the last valid one to the
+    # end of file. Truncated last line (unclean shutdown) is ignored.
+    #--------------------------------------------------------------------------
+
+    def loadsnapshots(self, path):
+        snapshots = []
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        snap = loadsnapshot(line)
+                    except (ValueError, KeyError, TypeError):
+                        break
+                    if snap[2] >= len(self.mm): break
+                    snapshots.append(snap)
+        except OSError:
+            pass
+
+        if not snapshots: snapshots = [(0, 0, len(magic), {})]
+
+        records, lines, offset, values = snapshots[-1]
+        values = dict(values)
+        for offset, kind, ms, channel, tag, payload in self.scan(offset):
+            if records % snapshot == 0 and offset != snapshots[-1][2]:
+                snapshots.append((records, lines, offset, dict(values)))
+            records += 1
+            if kind == "watch":
+                values[(channel, tag)] = payload
+            else:
+                lines += 1
+
+        return snapshots
+
+    #--------------------------------------------------------------------------
+    # Iterate records starting from offset. Truncated record at the end of
+    # file (e.g. logger was killed) is ignored.
+    #--------------------------------------------------------------------------
+
+    def scan(self, offset):
+        mm, size = self.mm, len(self.mm)
+        unpack = header.unpack_from
+        while offset + header.size <= size:
+            code, ms, lc, lt, lp = unpack(mm, offset)
+            start = offset + header.size
+            c_end = start + (0 if lc == NONE else lc)
+            t_end = c_end + (0 if lt == NONE else lt)
+            end = t_end + lp
+            if end > size: return
+            yield (
+                offset, kinds[code], ms,
+                decode(mm[start:c_end], lc),
+                decode(mm[c_end:t_end], lt),
+                mm[t_end:end].decode("utf-8", "replace")
+            )
+            offset = end
+
+    #--------------------------------------------------------------------------
+    # Seeking: log() returns log lines [first, first + count) as tuples
+    # (kind, channel, payload, ms), line_at() gives the number of first log
+    # line at or after given time, and watches() gives watch values at given
+    # line (scanning from the nearest snapshot).
+    #--------------------------------------------------------------------------
+
+    def log(self, first, count):
+        from bisect import bisect_right
+        i = bisect_right(self.linekeys, first) - 1
+        records, line, ms, offset = self.index[max(0, i)]
+        result = []
+        for offset, kind, ms, channel, tag, payload in self.scan(offset):
+            if kind == "watch": continue
+            if line >= first:
+                result.append((kind, channel, payload, ms))
+                if len(result) >= count: break
+            line += 1
+        return result
+
+    def line_at(self, seconds):
+        from bisect import bisect_left
+        ms = int(seconds * 1000)
+        i = bisect_left(self.timekeys, ms) - 1
+        records, line, t, offset = self.index[max(0, i)]
+        for offset, kind, t, channel, tag, payload in self.scan(offset):
+            if t >= ms and kind != "watch": break
+            if kind != "watch": line += 1
+        return line
+
+    def watches(self, line):
+        from bisect import bisect_right
+        i = bisect_right(self.snapkeys, line) - 1
+        records, n, offset, values = self.snapshots[max(0, i)]
+        values = dict(values)
+        for offset, kind, ms, channel, tag, payload in self.scan(offset):
+            if kind == "watch":
+                values[(channel, tag)] = payload
+            else:
+                n += 1
+                if n > line: break
+        return values
+
+    def close(self):
+        self.mm.close()
+
+#------------------------------------------------------------------------------
+# Line store interface (see logger.LineStore) for showing session in
+# LogView.
+#------------------------------------------------------------------------------
+
+class SessionStore:
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def __len__(self):
+        return self.reader.lines
+
+    def get(self, first, count):
+        result = []
+        for kind, channel, payload, ms in self.reader.log(max(0, first), count):
+            if kind == "eof":
+                result.append(("Done.", "logger"))
+            elif kind == "logger":
+                result.append((payload, "logger"))
+            elif channel is not None:
+                result.append(("%s:%s" % (channel, payload), "stdout"))
+            else:
+                result.append((payload, "stdout"))
+        return result
+
+    def append(self, text, color):
+        pass
+
+    def clear(self):
+        pass
+
+#------------------------------------------------------------------------------
+# Position from user: "1234" is line number, "12.5s" is time in seconds.
+#------------------------------------------------------------------------------
+
+def position(reader, text):
+    text = text.strip()
+    try:
+        if text.endswith("s"):
+            return reader.line_at(float(text[:-1]))
+        return int(text)
+    except ValueError:
+        raise ValueError("Bad position '%s': use line number, or time (e.g. 12.5s)" % text) from None
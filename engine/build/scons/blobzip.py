@@ -0,0 +1,202 @@
+###############################################################################
+#
+# Packing BLOB archives. Archive is rebuilt incrementally: members of
+# unchanged files are copied from the previous archive as they are
+# (compressed data and all), and only new and changed files are
+# compressed. Manifest <archive>.manifest keeps size and modification time
+# of each packed file, so that unchanged files are found without reading
+# them.
+#
+# New and changed files are compressed in parallel in a process pool, and
+# the archive is assembled by one writer in source order, so the result does
+# not depend on the number of workers.
+#
+# This is a plain Python module (not an SConscript), imported by build.py.
+#
+###############################################################################
+
+import os, json, struct, zlib, zipfile
+from copy import copy
+from collections import deque
+
+#------------------------------------------------------------------------------
+# Manifest
+#------------------------------------------------------------------------------
+
+def stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def loadmanifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def savemanifest(path, manifest):
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent = 0, sort_keys = True)
+    os.replace(path + ".tmp", path)
+
+#------------------------------------------------------------------------------
+# Raw member copy: local header and compressed data of the old member are
+# copied to the end of the new archive, and the central directory entry
+# is added with the new header offset. Members with data descriptors are
+# not copied (zipfile does not write them to seekable files, so we don't
+# have any), and False is returned to compress the file instead.
+#------------------------------------------------------------------------------
+
+localheader = struct.Struct("<4s5HLLL2H")
+
+def copyraw(src, info, zipf):
+    if info.flag_bits & 0x08: return False
+
+    src.seek(info.header_offset)
+    header = src.read(localheader.size)
+    if len(header) < localheader.size: return False
+    fields = localheader.unpack(header)
+    if fields[0] != b"PK\x03\x04": return False
+
+    data = src.read(fields[-2] + fields[-1] + info.compress_size)
+
+    zipf.fp.seek(zipf.start_dir)
+    member = copy(info)
+    member.header_offset = zipf.fp.tell()
+    zipf.fp.write(header + data)
+    zipf.start_dir = zipf.fp.tell()
+    zipf.filelist.append(member)
+    zipf.NameToInfo[member.filename] = member
+    return True
+
+#------------------------------------------------------------------------------
+# Compressing: compress() runs in pool workers and returns raw deflate stream
+# with CRC and sizes, and addraw() writes it to archive as a member.
+#------------------------------------------------------------------------------
+
+def compress(path):
+    deflate = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    crc, size, chunks = 0, 0, []
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1 << 20)
+            if not block: break
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            chunks.append(deflate.compress(block))
+    chunks.append(deflate.flush())
+    return crc, size, b"".join(chunks)
+
+def addraw(zipf, path, arcname, crc, size, data):
+    info = zipfile.ZipInfo.from_file(path, arcname)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.CRC = crc
+    info.file_size = size
+    info.compress_size = len(data)
+
+    zipf.fp.seek(zipf.start_dir)
+    info.header_offset = zipf.fp.tell()
+    zipf.fp.write(info.FileHeader())
+    zipf.fp.write(data)
+    zipf.start_dir = zipf.fp.tell()
+    zipf.filelist.append(info)
+    zipf.NameToInfo[info.filename] = info
+
+#------------------------------------------------------------------------------
+# Pool runs compress() for changed files. With single job (or single file)
+# files are compressed in this process, giving the same bytes. Only a few
+# files per worker are submitted ahead of the writer, so that compressed
+# members are not piling up in memory.
+#------------------------------------------------------------------------------
+
+class Inline:
+
+    class Result:
+        def __init__(self, value): self.value = value
+        def result(self): return self.value
+
+    def submit(self, fn, *args):
+        return Inline.Result(fn(*args))
+
+    def shutdown(self):
+        pass
+
+def pool(jobs):
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(jobs) if jobs > 1 else Inline()
+
+class Window:
+
+    ahead = 2
+
+    def __init__(self, workers, jobs, paths):
+        self.workers = workers
+        self.size = self.ahead * jobs
+        self.paths = iter(paths)
+        self.pending = deque()
+        self.fill()
+
+    def fill(self):
+        while len(self.pending) < self.size:
+            path = next(self.paths, None)
+            if path is None: break
+            self.pending.append(self.workers.submit(compress, path))
+
+    def next(self):
+        result = self.pending.popleft().result()
+        self.fill()
+        return result
+
+#------------------------------------------------------------------------------
+# Pack files to archive. Archive names are relative to root. New archive
+# is written to a temporary file, and replaces the old one when complete.
+# log(op, name) is called for each file, op is "<=" for compressed and
+# "==" for copied members. jobs is the number of compressing processes
+# (default: number of CPUs).
+#------------------------------------------------------------------------------
+
+def pack(target, files, root, log = lambda op, name: None, jobs = None):
+    manifest = loadmanifest(target + ".manifest") if os.path.exists(target) else {}
+    src, old = None, None
+    if manifest:
+        try:
+            src = open(target, "rb")
+            old = zipfile.ZipFile(src)
+        except (OSError, zipfile.BadZipFile):
+            if src is not None: src.close()
+            src, old, manifest = None, None, {}
+
+    members = []
+    for path in files:
+        arcname = os.path.relpath(path, root)
+        current = stamp(path)
+        info = old.NameToInfo.get(arcname.replace(os.sep, "/")) if old else None
+        if info is not None and manifest.get(arcname) != current: info = None
+        members.append((path, arcname, current, info))
+
+    changed = [path for path, arcname, current, info in members if info is None]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(changed)))
+    workers = pool(jobs)
+    try:
+        window = Window(workers, jobs, changed)
+
+        packed = {}
+        with zipfile.ZipFile(target + ".tmp", "w", zipfile.ZIP_DEFLATED) as zipf:
+            for path, arcname, current, info in members:
+                if info is None:
+                    addraw(zipf, path, arcname, *window.next())
+                    log("<=", arcname)
+                elif copyraw(src, info, zipf):
+                    log("==", arcname)
+                else:
+                    addraw(zipf, path, arcname, *compress(path))
+                    log("<=", arcname)
+                packed[arcname] = current
+    finally:
+        workers.shutdown()
+        if old is not None:
+            old.close()
+            src.close()
+
+    os.replace(target + ".tmp", target)
+    savemanifest(target + ".manifest", packed)
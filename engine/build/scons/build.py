@@ -56,11 +56,15 @@ def findfiles(env, dirs):
     return result
 
 #------------------------------------------------------------------------------
-# Zipping source (files) to archive (target)
+# Zipping source (files) to archive (target). Packing is incremental, see
+# blobzip.py.
 #------------------------------------------------------------------------------
 
+import sys
+sys.path.insert(0, env.subst("$ENGINE/build/scons"))
+
 def zipdir(target, source, env):
-    import zipfile
+    import blobzip
 
     tgtname = target[0].name
     target  = target[0].abspath
@@ -69,14 +73,12 @@ def zipdir(target, source, env):
     if not os.path.exists(zipdir):
         os.mkdir(zipdir)
 
-    zipf = zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED)
-
-    for file in source:
-        archivename = os.path.relpath(file.abspath, env["ROOTDIR"])
-        print(tgtname, "<=", archivename)
-        zipf.write(file.abspath, arcname = archivename)
-
-    zipf.close()
+    blobzip.pack(
+        target,
+        [file.abspath for file in source],
+        env["ROOTDIR"],
+        lambda op, name: print(tgtname, op, name)
+    )
 
 env["BUILDERS"]["BLOB"] = Builder(
     action = zipdir,
@@ -134,6 +136,60 @@ def GetDependencies(env, prog, main):
         exit(-1)
     return sources.split()
 
+#------------------------------------------------------------------------------
+# Resolved dependencies are cached to <prog>.deps. Cache is valid as long
+# as the rdmd command line (with DFLAGS) and the contents of the sources
+# found last time are the same: imports can't change without changing
+# some of those. Content hash is computed only for files whose size or
+# modification time has changed.
+#------------------------------------------------------------------------------
+
+def FileSignature(path, known = None):
+    import hashlib
+
+    st = os.stat(path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    if known is not None and known[0] == stamp: return known
+
+    with open(path, "rb") as f:
+        return [stamp, hashlib.md5(f.read()).hexdigest()]
+
+def CachedDependencies(env, prog, main):
+    import json
+
+    cachefile = env.subst(prog) + ".deps"
+    command = env.subst("rdmd --makedepend -of{} $DFLAGS {}".format(prog, main))
+
+    def save(sources, signatures):
+        os.makedirs(os.path.dirname(cachefile), exist_ok = True)
+        with open(cachefile + ".tmp", "w") as f:
+            json.dump({"command": command, "sources": sources, "signatures": signatures}, f)
+        os.replace(cachefile + ".tmp", cachefile)
+
+    try:
+        with open(cachefile) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = None
+
+    if cache is not None and cache.get("command") == command:
+        try:
+            signatures = dict(
+                (path, FileSignature(path, known)) for path, known in cache["signatures"].items()
+            )
+        except OSError:
+            signatures = None
+
+        if signatures is not None and all(
+            signatures[path][1] == known[1] for path, known in cache["signatures"].items()
+        ):
+            if signatures != cache["signatures"]: save(cache["sources"], signatures)
+            return cache["sources"]
+
+    sources = GetDependencies(env, prog, main)
+    save(sources, dict((path, FileSignature(path)) for path in set(sources) | {main}))
+    return sources
+
 def RDMD_Emitter(target, source, env):
 
     exe = target[0].abspath
@@ -143,7 +199,7 @@ def RDMD_Emitter(target, source, env):
     else:
         main, source = source[0].abspath, source[1:]
 
-    return target, GetDependencies(env, exe, main) + source
+    return target, CachedDependencies(env, exe, main) + source
 
 #------------------------------------------------------------------------------
 # RDMD builder
@@ -207,6 +263,13 @@ else:
 if " ".join(COMMAND_LINE_TARGETS) != "logger":
 
     blob = env.BLOB("$OUTDIR/BLOB.zip", findfiles(env, env["BLOBFILES"]))
+
+    # BLOB is packed incrementally from the previous archive, so SCons must
+    # not delete it before building. Manifest is written along with it.
+    env.Precious(blob)
+    env.SideEffect("$OUTDIR/BLOB.zip.manifest", blob)
+    env.Clean(blob, "$OUTDIR/BLOB.zip.manifest")
+
     exe = env.RDMD("$EXE", ["$ROOTDIR/$MAIN", blob])
     PhonyTarget(env, "run", exe, runtarget)
 
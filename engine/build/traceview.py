@@ -1,50 +1,848 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 ###############################################################################
 #
-# Examine trace files: Extract only function call timings, and sort them
-# by call tree time (and later maybe with other fields).
+# Examine trace files (DMD -profile trace.log): Extract function call
+# timings, sort them by call tree time or number of calls, sum them by
+# package and module, compare traces of two runs (or two sets of repeated
+# runs), and export call graph for flame graphs. Examples:
+#
+#   traceview.py by_treetime
+#   traceview.py by_numcalls path/to/trace.log
+#   traceview.py by_functime --top 50 --match scene3d
+#   traceview.py diff old/trace.log new/trace.log --rel 5 --hot 20
+#   traceview.py flame --format speedscope -o trace.speedscope.json
+#   traceview.py rollup --prefix engine.render --demangle
+#   traceview.py stats new/*/trace.log --baseline old/*/trace.log
 #
 ###############################################################################
 
-import sys
+import sys, os
 
-if len(sys.argv) < 2:
-    print "Usage: traceview {by_treetime | by_numcalls}"
-    sys.exit(-1)
+try:
+    import numpy as np
+except ImportError:
+    print("traceview needs NumPy")
+    exit(-1)
 
 #------------------------------------------------------------------------------
-# Extract info
+# Extract info: trace.log has call graph sections first, and the flat
+# timing table after the "======== Timer Is ..." line. Table lines are
+#
+#   <num calls> <tree time> <func time> <per call> <function>
+#
+# File is memory mapped and read one line at a time, so memory use
+# depends only on the number of functions, not on the size of the trace.
 #------------------------------------------------------------------------------
 
-records = []
+def scan(path):
+    import mmap
 
-for line in open("trace.log").read().split("\n"):
-    fields = line.split(None, 4)
-    if len(fields) == 5:
-        try:
-            for i in range(0, 4): fields[i] = int(fields[i])
-            records.append(fields)
-        except ValueError: pass
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0: return
+        mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+    with mm:
+        start = mm.find(b"\n========")
+        mm.seek(0 if start == -1 else start + 1)
+
+        for line in iter(mm.readline, b""):
+            fields = line.split(None, 4)
+            if len(fields) == 5:
+                try:
+                    yield (
+                        int(fields[0]), int(fields[1]), int(fields[2]), int(fields[3]),
+                        fields[4].strip().decode("utf-8", "replace")
+                    )
+                except ValueError: pass
+
+###############################################################################
+#
+# Trace table in columns: one NumPy array per field, and function ids to
+# the name table. Sorting, filtering and top-N are done with array
+# operations.
+#
+###############################################################################
+
+class Trace:
+
+    fields = ("calls", "tree", "func", "percall")
+
+    def __init__(self, calls, tree, func, percall, ids, names):
+        self.calls   = calls
+        self.tree    = tree
+        self.func    = func
+        self.percall = percall
+        self.ids     = ids
+        self.names   = names
+
+    @classmethod
+    def parse(cls, path):
+        rows, names = [], []
+        for calls, tree, func, percall, name in scan(path):
+            rows.append((calls, tree, func, percall))
+            names.append(name)
+
+        table = np.array(rows, dtype = np.int64).reshape(-1, 4)
+        return cls(
+            *(np.ascontiguousarray(table[:, i]) for i in range(4)),
+            np.arange(len(names), dtype = np.int32),
+            np.array(names, dtype = object),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    sidecar = ".tvcache.npz"
+
+    def columns(self):
+        columns = dict((field, getattr(self, field)) for field in Trace.fields)
+        columns.update(ids = self.ids, names = packnames(self.names))
+        return columns
+
+    @classmethod
+    def fromcolumns(cls, data):
+        return cls(
+            *(data[field] for field in Trace.fields),
+            data["ids"],
+            unpacknames(data["names"], len(data["ids"])),
+        )
+
+    #--------------------------------------------------------------------------
+    # Queries return row indices. order() gives rows sorted by field in
+    # descending order, only the top rows are sorted when top is given.
+    #--------------------------------------------------------------------------
+
+    def order(self, field, top = None, rows = None):
+        key = getattr(self, field)
+        if rows is not None: key = key[rows]
+
+        if top is not None and top < len(key):
+            idx = np.argpartition(-key, top)[:top]
+            idx = idx[np.argsort(-key[idx], kind = "stable")]
+        else:
+            idx = np.argsort(-key, kind = "stable")
+        return idx if rows is None else rows[idx]
+
+    def match(self, pattern):
+        search = re.compile(pattern).search
+        hits = np.fromiter((search(name) is not None for name in self.names), dtype = bool, count = len(self.names))
+        return np.flatnonzero(hits[self.ids])
+
+    def rows(self, idx):
+        return zip(
+            self.calls[idx].tolist(), self.tree[idx].tolist(),
+            self.func[idx].tolist(), self.percall[idx].tolist(),
+            self.names[self.ids[idx]].tolist(),
+        )
+
+###############################################################################
+#
+# Call graph: trace.log starts with a section for each function:
+#
+#   ------------------
+#           <calls>     <caller>            Fan in
+#   <function>  <calls> <tree time> <func time>
+#           <calls>     <callee>            Fan out
+#
+# Graph has the function stats, and fan out edges as arrays src, dst and
+# count. Times in the call graph are timer ticks, they are converted to
+# microseconds with the timer frequency.
+#
+###############################################################################
+
+import re
+
+timerline = re.compile(rb"Timer Is (\d+) Ticks/Sec")
+
+class Graph:
+
+    sidecar = ".tvgraph.npz"
+
+    def __init__(self, calls, tree, func, src, dst, count, names, frequency):
+        self.calls, self.tree, self.func = calls, tree, func
+        self.src, self.dst, self.count = src, dst, count
+        self.names = names
+        self.frequency = frequency
+
+    @classmethod
+    def parse(cls, path):
+        import mmap
+
+        ids, stats, edges = {}, [], []
+        frequency = 0
+
+        def intern(name):
+            name = name.strip().decode("utf-8", "replace")
+            fid = ids.get(name)
+            if fid is None:
+                fid = ids[name] = len(stats)
+                stats.append((0, 0, 0))
+            return fid
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) if size else None
+
+        if mm is not None:
+            with mm:
+                current = None
+                for line in iter(mm.readline, b""):
+                    if line.startswith(b"=="):
+                        m = timerline.search(line)
+                        if m: frequency = int(m.group(1))
+                        break
+                    if line.startswith(b"-"):
+                        current = None
+                    elif line[:1] in (b"\t", b" "):
+                        if current is not None:
+                            fields = line.split(None, 1)
+                            if len(fields) == 2 and fields[0].isdigit():
+                                edges.append((current, intern(fields[1]), int(fields[0])))
+                    else:
+                        fields = line.rstrip().split(b"\t")
+                        if len(fields) == 4:
+                            try:
+                                current = intern(fields[0])
+                                stats[current] = (int(fields[1]), int(fields[2]), int(fields[3]))
+                            except ValueError:
+                                current = None
+
+        stats = np.array(stats, dtype = np.int64).reshape(-1, 3)
+        edges = np.array(edges, dtype = np.int64).reshape(-1, 3)
+        names = [None] * len(ids)
+        for name, fid in ids.items(): names[fid] = name
+
+        return cls(
+            *(np.ascontiguousarray(stats[:, i]) for i in range(3)),
+            *(np.ascontiguousarray(edges[:, i]) for i in range(3)),
+            np.array(names, dtype = object),
+            frequency,
+        )
+
+    def columns(self):
+        return dict(
+            calls = self.calls, tree = self.tree, func = self.func,
+            src = self.src, dst = self.dst, count = self.count,
+            names = packnames(self.names),
+            frequency = np.array([self.frequency]),
+        )
+
+    @classmethod
+    def fromcolumns(cls, data):
+        return cls(
+            data["calls"], data["tree"], data["func"],
+            data["src"], data["dst"], data["count"],
+            unpacknames(data["names"], len(data["calls"])),
+            int(data["frequency"][0]),
+        )
+
+    #--------------------------------------------------------------------------
+    # Stacks: trace has only call counts per edge, so the time of a function
+    # is split to its callers in proportion to calls. Stacks start from
+    # functions nobody calls (e.g. _Dmain), recursion is cut at the first
+    # repeat, and paths with less than cutoff of the total time are pruned
+    # to keep the output bounded. Yields (function ids, microseconds).
+    #--------------------------------------------------------------------------
+
+    def stacks(self, cutoff = 1e-4):
+        n = len(self.calls)
+        if not n: return
+
+        order = np.argsort(self.src, kind = "stable")
+        src, dst, count = self.src[order], self.dst[order], self.count[order]
+        first = np.searchsorted(src, np.arange(n), "left").tolist()
+        last = np.searchsorted(src, np.arange(n), "right").tolist()
+        dst, count = dst.tolist(), count.tolist()
+        calls, tree, func = self.calls.tolist(), self.tree.tolist(), self.func.tolist()
+
+        scale = 1e6 / self.frequency if self.frequency else 1.0
+        roots = np.setdiff1d(np.arange(n), self.dst)
+        if not len(roots): roots = np.array([int(np.argmax(self.tree))])
+        limit = cutoff * float(self.tree[roots].sum())
+
+        todo = [((root,), 1.0) for root in roots.tolist()[::-1]]
+        while todo:
+            path, fraction = todo.pop()
+            fid = path[-1]
+            if func[fid]: yield path, func[fid] * fraction * scale
+
+            for e in range(last[fid] - 1, first[fid] - 1, -1):
+                child = dst[e]
+                if child in path or not calls[child]: continue
+                share = fraction * min(1.0, count[e] / calls[child])
+                if tree[child] * share < limit: continue
+                todo.append((path + (child,), share))
 
 #------------------------------------------------------------------------------
-# Sort
+# Exports: collapsed stacks (flamegraph.pl, inferno) and speedscope JSON
 #------------------------------------------------------------------------------
 
-records = {
-    "by_treetime": reversed(sorted(records, key = lambda r: r[1])),
-    "by_numcalls": reversed(sorted(records, key = lambda r: r[0])),
-}[sys.argv[1]]
+def collapsed(graph, cutoff, out = sys.stdout):
+    names = graph.names
+    for path, weight in graph.stacks(cutoff):
+        weight = int(round(weight))
+        if weight: out.write("%s %d\n" % (";".join(names[i] for i in path), weight))
+
+def speedscope(graph, cutoff, name, out = sys.stdout):
+    import json
+
+    frames, index = [], {}
+    samples, weights = [], []
+    for path, weight in graph.stacks(cutoff):
+        for fid in path:
+            if fid not in index:
+                index[fid] = len(frames)
+                frames.append({"name": graph.names[fid]})
+        samples.append([index[fid] for fid in path])
+        weights.append(weight)
+
+    json.dump({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "microseconds" if graph.frequency else "none",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "traceview",
+    }, out)
+
+###############################################################################
+#
+# Parsed traces are cached to sidecar files next to the trace. Cache is
+# valid while the size and modification time of the trace match. Names
+# are stored as one newline separated blob.
+#
+###############################################################################
+
+cacheversion = 1
+
+def packnames(names):
+    return np.frombuffer("\n".join(names.tolist()).encode("utf-8"), dtype = np.uint8)
+
+def unpacknames(blob, count):
+    names = blob.tobytes().decode("utf-8").split("\n") if count else []
+    return np.array(names, dtype = object)
+
+def save(columns, path, key):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, version = np.array([cacheversion]), key = key, **columns)
+    os.replace(tmp, path)
+
+def restore(path, key):
+    from zipfile import BadZipFile
+    try:
+        with np.load(path, allow_pickle = False) as data:
+            if data["version"][0] != cacheversion or not np.array_equal(data["key"], key): return None
+            return dict((name, data[name]) for name in data.files)
+    except (OSError, KeyError, ValueError, BadZipFile):
+        return None
+
+def load(path, cache = True, kind = Trace):
+    st = os.stat(path)
+    key = np.array([st.st_size, st.st_mtime_ns], dtype = np.int64)
+    sidecar = path + kind.sidecar
+
+    columns = restore(sidecar, key) if cache else None
+    if columns is not None:
+        try:
+            return kind.fromcolumns(columns)
+        except KeyError:
+            pass
+
+    trace = kind.parse(path)
+    if cache:
+        try:
+            save(trace.columns(), sidecar, key)
+        except OSError:
+            pass
+    return trace
+
+###############################################################################
+#
+# Views
+#
+###############################################################################
+
+orders = {
+    "by_treetime": "tree",
+    "by_functime": "func",
+    "by_percall":  "percall",
+    "by_numcalls": "calls",
+}
+
+def view(trace, order, top = None, match = None):
+    rows = None if match is None else trace.match(match)
+    return trace.rows(trace.order(orders[order], top, rows))
 
 #------------------------------------------------------------------------------
 # Print back
 #------------------------------------------------------------------------------
 
-header = [
-    ["Num Call", "Tree Time", "Func Time", "Per Call", ""],
-    5 * [""],
-]
+def show(records, out = sys.stdout):
+    header = [
+        ["Num Call", "Tree Time", "Func Time", "Per Call", ""],
+        5 * [""],
+    ]
+
+    for record in header + list(records):
+        out.write("%12s %12s %12s %12s   %s\n" % tuple(record[i] for i in [1, 2, 3, 0, 4]))
+
+###############################################################################
+#
+# D symbols: Demangle enough to get qualified names: _D, then LNames
+# (<length><identifier>) and back references (Q<base 26 offset>). Template
+# instance (__T<name>...) ends the name as name!(...), and the type is
+# left out, except that functions get "()". Results are memoized, since
+# the same symbols come up in every query and trace.
+#
+###############################################################################
+
+from functools import lru_cache
+
+def lname(symbol, pos):
+    end = pos
+    while symbol[end].isdigit(): end += 1
+    length = int(symbol[pos:end])
+    ident = symbol[end:end + length]
+    if len(ident) < length: raise ValueError(symbol)
+    if ident.startswith("__T") and ident[3:4].isdigit():
+        ident = lname(ident, 3)[0] + "!(...)"
+    return ident, end + length
+
+def backref(symbol, pos):
+    end, offset = pos + 1, 0
+    while symbol[end].isupper():
+        offset = 26 * offset + ord(symbol[end]) - ord("A")
+        end += 1
+    offset = 26 * offset + ord(symbol[end]) - ord("a")
+    if not 0 < offset <= pos or not symbol[pos - offset].isdigit(): raise ValueError(symbol)
+    return lname(symbol, pos - offset)[0], end + 1
+
+@lru_cache(maxsize = None)
+def demangle(symbol):
+    if symbol == "_Dmain": return "D main"
+    if not symbol.startswith("_D") or not symbol[2:3].isdigit(): return symbol
+
+    parts, pos = [], 2
+    try:
+        while pos < len(symbol):
+            c = symbol[pos]
+            if c.isdigit():
+                name, pos = lname(symbol, pos)
+            elif c == "Q":
+                name, pos = backref(symbol, pos)
+            elif symbol.startswith("__T", pos) and symbol[pos + 3:pos + 4].isdigit():
+                parts.append(lname(symbol, pos + 3)[0] + "!(...)")
+                return ".".join(parts)
+            else:
+                break
+            parts.append(name)
+    except (ValueError, IndexError):
+        return symbol
+
+    if symbol[pos:pos + 1] == "M": pos += 1
+    return ".".join(parts) + ("()" if symbol[pos:pos + 1] == "F" else "")
+
+def demangled(names):
+    return np.array([demangle(name) for name in names.tolist()], dtype = object)
+
+#------------------------------------------------------------------------------
+# Rollups: Sum function times by package and module, e.g. engine.render.*
+# vs engine.gpu.*. level(prefix) gives the groups one level below prefix.
+# Func time sums are exact, tree time sums count nested calls inside the
+# group more than once. Non-D symbols are grouped under "(extern)".
+# Names are split at dots outside template arguments, so that
+# std.conv.to!(...) is one part.
+#------------------------------------------------------------------------------
+
+separator = re.compile(r"\.(?![^(]*\))")
+
+def qualified(name):
+    return tuple(separator.split(name))
+
+class Rollup:
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.parts = [self.split(name) for name in demangled(trace.names[trace.ids]).tolist()]
+
+    @staticmethod
+    def split(name):
+        if name == "D main" or "." in name: return qualified(name)
+        return ("(extern)", name)
+
+    def level(self, prefix = ()):
+        n = len(prefix)
+        rows, keys, branch = [], [], []
+        for i, parts in enumerate(self.parts):
+            if len(parts) > n and parts[:n] == prefix:
+                rows.append(i)
+                keys.append(parts[n])
+                branch.append(len(parts) > n + 1)
+
+        keys, inverse = np.unique(np.array(keys, dtype = object), return_inverse = True)
+        rows = np.array(rows, dtype = np.intp)
+        sums = dict(
+            (field, np.bincount(inverse, weights = getattr(self.trace, field)[rows], minlength = len(keys)))
+            for field in ("calls", "tree", "func")
+        )
+        sums["functions"] = np.bincount(inverse, minlength = len(keys))
+        sums["branch"] = np.bincount(inverse, weights = np.array(branch, dtype = float), minlength = len(keys)) > 0
+        return keys, sums
+
+    def show(self, prefix = (), top = None, out = sys.stdout):
+        keys, sums = self.level(prefix)
+        idx = np.argsort(-sums["func"], kind = "stable")[:top]
+
+        out.write("%12s %12s %12s %9s   %s\n" % ("Tree Time", "Func Time", "Num Call", "Functions", ".".join(prefix)))
+        for i in idx:
+            name = ".".join(prefix + (keys[i],))
+            out.write("%12d %12d %12d %9d   %s%s\n" % (
+                sums["tree"][i], sums["func"][i], sums["calls"][i], sums["functions"][i],
+                name, ".*" if sums["branch"][i] else ""
+            ))
+
+    #--------------------------------------------------------------------------
+    # Drill down: enter group to go down, ".." to go up, empty to quit.
+    #--------------------------------------------------------------------------
+
+    def browse(self, prefix = (), top = None):
+        while True:
+            self.show(prefix, top)
+            try:
+                answer = input("\n%s> " % ".".join(prefix)).strip()
+            except EOFError:
+                return
+            if not answer:
+                return
+            elif answer == "..":
+                prefix = prefix[:-1]
+            else:
+                prefix = qualified(answer.rstrip(".*"))
+
+###############################################################################
+#
+# Comparing traces: Functions are matched by name. align() puts the
+# tables of traces to common rows: table[trace, field, function], and
+# present[trace, function] tells if the function was in the trace.
+#
+###############################################################################
+
+def align(traces):
+    allnames = np.concatenate([t.names[t.ids] for t in traces])
+    names, inverse = np.unique(allnames, return_inverse = True)
+
+    table = np.zeros((len(traces), len(Trace.fields), len(names)), dtype = np.int64)
+    present = np.zeros((len(traces), len(names)), dtype = bool)
+    offset = 0
+    for i, trace in enumerate(traces):
+        rows = inverse[offset:offset + len(trace)]
+        for k, field in enumerate(Trace.fields):
+            table[i, k, rows] = getattr(trace, field)
+        present[i, rows] = True
+        offset += len(trace)
+    return names, table, present
+
+#------------------------------------------------------------------------------
+# Diff: Change of each field from old to new. Function regresses, when it
+# is hot (in top n of the metric in either trace), and its metric grows
+# more than both absolute and relative thresholds. Functions missing from
+# old trace have infinite relative change.
+#------------------------------------------------------------------------------
+
+class Diff:
+
+    def __init__(self, old, new, metric = "tree", relative = 10.0, absolute = 0, hot = 50):
+        self.names, table, present = align([old, new])
+        self.old, self.new = table[0], table[1]
+        self.delta = self.new - self.old
+        self.added = present[1] & ~present[0]
+        self.removed = present[0] & ~present[1]
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            self.change = 100.0 * self.delta / self.old
+
+        k = Trace.fields.index(metric)
+        self.metric = k
+        self.hot = np.zeros(len(self.names), dtype = bool)
+        for values in (self.old[k], self.new[k]):
+            self.hot[np.argsort(-values, kind = "stable")[:hot]] = True
+
+        self.regressed = self.hot & (self.delta[k] > absolute) & (self.change[k] > relative)
+
+    def order(self, top = None):
+        changed = np.flatnonzero(self.delta.any(axis = 0))
+        idx = changed[np.argsort(-self.delta[self.metric][changed], kind = "stable")]
+        if top is not None:
+            idx = np.union1d(idx[:top], np.flatnonzero(self.regressed))
+            idx = idx[np.argsort(-self.delta[self.metric][idx], kind = "stable")]
+        return idx
+
+    def show(self, idx, out = sys.stdout):
+        order = [1, 2, 3, 0]
+        labels = ["Num Call", "Tree Time", "Func Time", "Per Call"]
+
+        out.write("  " + " ".join("%20s" % labels[k] for k in order) + "\n")
+        for i in idx:
+            cells = []
+            for k in order:
+                if self.added[i]:
+                    change = "new"
+                elif self.removed[i]:
+                    change = "gone"
+                else:
+                    change = "%+.1f%%" % self.change[k, i] if self.old[k, i] else "-"
+                cells.append("%+12d %7s" % (self.delta[k, i], change))
+            out.write("%s %s   %s\n" % ("!" if self.regressed[i] else " ", " ".join(cells), self.names[i]))
+
+        count = int(self.regressed.sum())
+        out.write("\n%d regression%s\n" % (count, "" if count == 1 else "s"))
+
+###############################################################################
+#
+# Statistics over repeated runs: Traces are parsed in a process pool,
+# aligned, and each function gets mean, standard deviation and confidence
+# interval of the mean. Compared to baseline runs, function regresses
+# only if the confidence interval of the difference (Welch) is above zero,
+# in addition to the thresholds used by diff. Run-to-run noise can't be
+# estimated from a single run, so regressions are flagged only when both
+# sides have at least two runs.
+#
+###############################################################################
+
+def loadall(paths, cache = True, jobs = None):
+    if len(paths) < 2 or jobs == 1:
+        return [load(path, cache) for path in paths]
+
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    with ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(partial(load, cache = cache), paths))
+
+#------------------------------------------------------------------------------
+# Student's t quantile for an array of degrees of freedom: exact for 1 and
+# 2, Cornish-Fisher expansion from the normal quantile otherwise (good to a
+# few parts in thousand already at 3). Fractional degrees of freedom (from
+# Welch) are rounded down, which gives slightly wider intervals.
+#------------------------------------------------------------------------------
+
+def tquantile(p, df):
+    from math import tan, pi, sqrt
+    from statistics import NormalDist
+
+    df = np.floor(np.maximum(1.0, np.asarray(df, dtype = float)))
+    z = NormalDist().inv_cdf(p)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+    t = z + g1 / df + g2 / df**2 + g3 / df**3 + g4 / df**4
+
+    t = np.where(df == 2, (2 * p - 1) / sqrt(2 * p * (1 - p)), t)
+    return np.where(df == 1, tan(pi * (p - 0.5)), t)
+
+#------------------------------------------------------------------------------
+
+class Sample:
+
+    def __init__(self, table, confidence):
+        self.n = table.shape[0]
+        self.mean = table.mean(axis = 0)
+        self.std = table.std(axis = 0, ddof = 1) if self.n > 1 else np.zeros_like(self.mean)
+        self.sem = self.std / np.sqrt(self.n)
+        self.ci = tquantile(0.5 + confidence / 200, self.n - 1) * self.sem if self.n > 1 else np.full_like(self.mean, np.inf)
+
+class Stats:
+
+    def __init__(self, runs, baseline = (), metric = "tree", confidence = 95.0,
+                 relative = 10.0, absolute = 0, hot = 50):
+        self.names, table, present = align(list(runs) + list(baseline))
+        self.runs = Sample(table[:len(runs)].astype(float), confidence)
+        self.base = Sample(table[len(runs):].astype(float), confidence) if baseline else None
+        self.metric = k = Trace.fields.index(metric)
+        self.regressed = np.zeros(len(self.names), dtype = bool)
+        if self.base is None: return
+
+        a, b = self.base, self.runs
+        self.delta = b.mean - a.mean
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            self.change = 100.0 * self.delta / a.mean
+
+            va, vb = a.sem**2, b.sem**2
+            df = (va + vb)**2 / (va**2 / max(1, a.n - 1) + vb**2 / max(1, b.n - 1))
+        df = np.nan_to_num(df[k], nan = float(a.n + b.n - 2))
+        self.margin = tquantile(0.5 + confidence / 200, df) * np.sqrt(va[k] + vb[k])
+        if min(a.n, b.n) < 2: self.margin = np.full_like(self.margin, np.inf)
+
+        self.hot = np.zeros(len(self.names), dtype = bool)
+        for values in (a.mean[k], b.mean[k]):
+            self.hot[np.argsort(-values, kind = "stable")[:hot]] = True
+
+        self.regressed = (
+            self.hot &
+            (self.delta[k] > absolute) &
+            (self.change[k] > relative) &
+            (self.delta[k] - self.margin > 0)
+        )
+
+    def order(self, top = None):
+        key = self.runs.mean[self.metric] if self.base is None else self.delta[self.metric]
+        idx = np.argsort(-key, kind = "stable")
+        if top is not None:
+            idx = np.union1d(idx[:top], np.flatnonzero(self.regressed))
+            idx = idx[np.argsort(-key[idx], kind = "stable")]
+        return idx
+
+    def show(self, idx, out = sys.stdout):
+        order = [1, 2, 3, 0]
+        labels = ["Num Call", "Tree Time", "Func Time", "Per Call"]
+        r, b = self.runs, self.base
+
+        if b is None:
+            out.write("  " + " ".join("%30s" % ("%s mean/std/ci" % labels[k]) for k in order) + "\n")
+            for i in idx:
+                cells = ["%10.0f %9.0f %9.0f" % (r.mean[k, i], r.std[k, i], r.ci[k, i]) for k in order]
+                out.write("  %s   %s\n" % (" ".join(cells), self.names[i]))
+            out.write("\n%d runs\n" % r.n)
+            return
+
+        k = self.metric
+        label = labels[k]
+        out.write("  %12s %12s %12s %12s %8s %12s\n" % (
+            "Base " + label, "Std", "New " + label, "Std", "Change", "Margin"
+        ))
+        for i in idx:
+            change = "%+.1f%%" % self.change[k, i] if b.mean[k, i] else "new"
+            out.write("%s %12.0f %12.0f %12.0f %12.0f %8s %12.0f   %s\n" % (
+                "!" if self.regressed[i] else " ",
+                b.mean[k, i], b.std[k, i], r.mean[k, i], r.std[k, i], change, self.margin[i],
+                self.names[i]
+            ))
+
+        count = int(self.regressed.sum())
+        out.write("\n%d baseline runs, %d runs, %d regression%s\n" % (b.n, r.n, count, "" if count == 1 else "s"))
+        if min(b.n, r.n) < 2:
+            out.write("Need at least 2 runs on both sides to flag regressions, use diff for single runs.\n")
+
+###############################################################################
+#
+# Parse arguments
+#
+###############################################################################
+
+def parseargs():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest = "command")
+    sub.required = True
+
+    def common(p):
+        p.add_argument("--top", type=int, metavar="<n>", default = None, help = "Show only n first functions")
+        p.add_argument("--demangle", action="store_true", help = "Show demangled D symbols")
+        p.add_argument("--no-cache", action="store_true", help = "Don't read or write parsed trace cache")
+
+    for order in sorted(orders):
+        p = sub.add_parser(order, help = "Sort functions by %s" % orders[order])
+        p.add_argument("trace", type=str, nargs="?", default = "trace.log", help = "Trace file")
+        p.add_argument("--match", type=str, metavar="<regex>", default = None, help = "Show only functions matching regex")
+        common(p)
+
+    p = sub.add_parser("flame", help = "Export call graph stacks for flame graphs")
+    p.add_argument("trace", type=str, nargs="?", default = "trace.log", help = "Trace file")
+    p.add_argument("--format", choices = ("collapsed", "speedscope"), default = "collapsed", help = "Output format")
+    p.add_argument("--output", "-o", type=str, metavar="<file>", default = None, help = "Output file (default stdout)")
+    p.add_argument("--cutoff", type=float, metavar="<fraction>", default = 1e-4, help = "Prune stacks below this fraction of total time")
+    p.add_argument("--demangle", action="store_true", help = "Show demangled D symbols")
+    p.add_argument("--no-cache", action="store_true", help = "Don't read or write parsed trace cache")
+
+    p = sub.add_parser("rollup", help = "Sum times by package and module")
+    p.add_argument("trace", type=str, nargs="?", default = "trace.log", help = "Trace file")
+    p.add_argument("--prefix", type=str, metavar="<name>", default = "", help = "Show groups below this, e.g. engine.render")
+    p.add_argument("-i", dest="interactive", action="store_true", help = "Drill down interactively")
+    common(p)
+
+    p = sub.add_parser("diff", help = "Compare two traces, exit with 1 if hot functions regress")
+    p.add_argument("old", type=str, help = "Old trace file")
+    p.add_argument("new", type=str, help = "New trace file")
+    p.add_argument("--metric", choices = Trace.fields, default = "tree", help = "Field checked for regressions")
+    p.add_argument("--rel", type=float, metavar="<percent>", default = 10.0, help = "Relative growth threshold")
+    p.add_argument("--abs", type=int, metavar="<time>", default = 0, help = "Absolute growth threshold")
+    p.add_argument("--hot", type=int, metavar="<n>", default = 50, help = "Check top n functions by metric")
+    common(p)
+
+    p = sub.add_parser("stats", help = "Statistics over repeated runs, exit with 1 if regressed from baseline")
+    p.add_argument("traces", type=str, nargs="+", help = "Trace files of the runs")
+    p.add_argument("--baseline", type=str, nargs="+", metavar="<trace>", default = (), help = "Trace files of baseline runs")
+    p.add_argument("--metric", choices = Trace.fields, default = "tree", help = "Field to sort and check for regressions")
+    p.add_argument("--confidence", type=float, metavar="<percent>", default = 95.0, help = "Confidence level of intervals")
+    p.add_argument("--rel", type=float, metavar="<percent>", default = 10.0, help = "Relative growth threshold")
+    p.add_argument("--abs", type=int, metavar="<time>", default = 0, help = "Absolute growth threshold")
+    p.add_argument("--hot", type=int, metavar="<n>", default = 50, help = "Check top n functions by metric")
+    p.add_argument("--jobs", "-j", type=int, metavar="<n>", default = None, help = "Parser processes (default: CPU count)")
+    common(p)
+
+    return parser.parse_args()
+
+#------------------------------------------------------------------------------
+
+def main():
+    args = parseargs()
+    cache = not args.no_cache
+    try:
+        if args.command == "diff":
+            diff = Diff(
+                load(args.old, cache), load(args.new, cache),
+                args.metric, args.rel, args.abs, args.hot
+            )
+            if args.demangle: diff.names = demangled(diff.names)
+            diff.show(diff.order(args.top))
+            return 1 if diff.regressed.any() else 0
+
+        if args.command == "stats":
+            stats = Stats(
+                loadall(args.traces, cache, args.jobs),
+                loadall(args.baseline, cache, args.jobs),
+                args.metric, args.confidence, args.rel, args.abs, args.hot
+            )
+            if args.demangle: stats.names = demangled(stats.names)
+            stats.show(stats.order(args.top))
+            return 1 if stats.regressed.any() else 0
+
+        if args.command == "flame":
+            graph = load(args.trace, cache, Graph)
+            if args.demangle: graph.names = demangled(graph.names)
+            out = sys.stdout if args.output is None else open(args.output, "w")
+            if args.format == "speedscope":
+                speedscope(graph, args.cutoff, os.path.basename(args.trace), out)
+            else:
+                collapsed(graph, args.cutoff, out)
+            if out is not sys.stdout: out.close()
+            return 0
+
+        trace = load(args.trace, cache)
 
-for record in header + list(records):
-    print "%12s %12s %12s %12s   %s" % tuple(record[i] for i in [1, 2, 3, 0, 4])
+        if args.command == "rollup":
+            rollup = Rollup(trace)
+            prefix = qualified(args.prefix) if args.prefix else ()
+            if args.interactive:
+                rollup.browse(prefix, args.top)
+            else:
+                rollup.show(prefix, args.top)
+            return 0
 
+        if args.demangle: trace.names = demangled(trace.names)
+        show(view(trace, args.command, args.top, args.match))
+    except BrokenPipeError:
+        pass
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())